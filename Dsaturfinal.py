@@ -1,19 +1,35 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
 from collections import defaultdict
 import heapq
+import importlib.util
 import os
 from datetime import datetime, timedelta
 
-# Cố gắng import để vẽ đồ thị
-try:
-    import networkx as nx
-    import matplotlib.pyplot as plt
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    HAS_GRAPH = True
-except Exception:
-    HAS_GRAPH = False
+# Thư viện vẽ đồ thị chỉ được import khi vẽ lần đầu (khởi động nhanh),
+# lúc khởi động chỉ kiểm tra xem đã cài đặt hay chưa
+HAS_GRAPH = all(importlib.util.find_spec(m) is not None
+                for m in ('networkx', 'matplotlib'))
+_graph_libs = None
+
+
+def load_graph_libs():
+    """
+    Import networkx + matplotlib (TkAgg) ở lần vẽ đầu tiên
+    Returns: (nx, plt, FigureCanvasTkAgg) hoặc None nếu không import được
+    """
+    global _graph_libs, HAS_GRAPH
+    if _graph_libs is None and HAS_GRAPH:
+        try:
+            import networkx as nx
+            import matplotlib
+            matplotlib.use('TkAgg')
+            import matplotlib.pyplot as plt
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            _graph_libs = (nx, plt, FigureCanvasTkAgg)
+        except Exception:
+            HAS_GRAPH = False
+    return _graph_libs
 
 
 class ExamSchedulerPro:
@@ -124,6 +140,11 @@ class ExamSchedulerPro:
 
         notebook = ttk.Notebook(right)
         notebook.pack(fill='both', expand=True, padx=8, pady=8)
+        self.notebook = notebook
+
+        # Đồ thị chỉ vẽ khi tab đồ thị được mở (tránh import matplotlib sớm)
+        self.graph_dirty = False
+        notebook.bind('<<NotebookTabChanged>>', self.refresh_graph_tab)
 
         # Tab 1: Lịch thi theo ngày (MỚI)
         tab1 = tk.Frame(notebook, bg='white')
@@ -185,6 +206,7 @@ class ExamSchedulerPro:
         # Tab 4: Đồ thị
         tab4 = tk.Frame(notebook, bg='white')
         notebook.add(tab4, text='📊 Đồ Thị Xung Đột')
+        self.tab_graph = tab4
         self.graph_canvas = tk.Canvas(tab4, bg='white')
         self.graph_canvas.pack(fill='both', expand=True, padx=8, pady=8)
         if not HAS_GRAPH:
@@ -203,6 +225,9 @@ class ExamSchedulerPro:
         if not path:
             return
 
+        # pandas chỉ được import khi tải file lần đầu (khởi động nhanh)
+        import pandas as pd
+
         try:
             all_dfs = []
             excel = pd.ExcelFile(path, engine='openpyxl')
@@ -403,7 +428,8 @@ class ExamSchedulerPro:
 
         self.display_results()
         self.check_conflicts()
-        self.draw_graph()
+        self.graph_dirty = True
+        self.refresh_graph_tab()
 
         total_days = (max(color_of.values()) + self.max_exams_per_day - 1) // self.max_exams_per_day
         messagebox.showinfo("HOÀN THÀNH",
@@ -525,11 +551,22 @@ class ExamSchedulerPro:
                 "✓ Không có xung đột thời gian"
             )
 
+    def refresh_graph_tab(self, *args):
+        # Vẽ lại đồ thị nếu tab đồ thị đang mở và dữ liệu đã thay đổi
+        if not self.graph_dirty:
+            return
+        if self.notebook.select() != str(self.tab_graph):
+            return
+        self.graph_dirty = False
+        self.draw_graph()
+
     def draw_graph(self):
         # Vẽ đồ thị xung đột nếu thư viện có sẵn
         self.graph_canvas.delete('all')
-        if not HAS_GRAPH:
+        libs = load_graph_libs()
+        if libs is None:
             return
+        nx, plt, FigureCanvasTkAgg = libs
 
         try:
             G = nx.Graph()
@@ -582,6 +619,8 @@ class ExamSchedulerPro:
         if not path:
             return
 
+        import pandas as pd
+
         # --- Lịch theo ngày: sắp xếp ngày ↑, trong ngày ca ↑ ---
         day_rows = []
         sorted_dates = sorted(self.schedule_by_day.keys(),
@@ -1,10 +1,1476 @@
 """
 backend.py - Xử lý logic và thuật toán DSatur
 """
-import pandas as pd
+import numpy as np
 from collections import defaultdict
+import csv
+import functools
 import heapq
-from datetime import datetime, timedelta
+import io
+import json
+import mmap
+import os
+import re
+import threading
+import zipfile
+from xml.sax.saxutils import escape
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import MappingProxyType
+
+# Định dạng file snapshot: MAGIC | độ dài header (uint64) | header JSON | các mảng căn lề 64 byte
+SNAPSHOT_MAGIC = b'EXSNAP1\0'
+SNAPSHOT_ALIGN = 64
+SNAPSHOT_VERSION = 2
+
+# Số phần tử tối đa của mỗi danh sách trong báo cáo chất lượng dữ liệu
+QUALITY_MAX_ITEMS = 200
+
+# Số kết quả tô màu giữ trong RAM của SolveCache
+SOLVE_CACHE_SIZE = 32
+
+# Số môn tối đa để DSatur dùng engine bitset (ma trận kề bitset ~2 MB ở 4096 môn)
+BITSET_MAX_SUBJECTS = 4096
+
+
+def _csr_indptr(keys, n):
+    """Tạo mảng indptr (CSR) từ mảng khóa đã sắp xếp tăng dần"""
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr
+
+
+def _build_conflict_graph(student_indptr, enroll_subject, n_subjects, row_weights=None):
+    """
+    Xây đồ thị xung đột dạng CSR từ các cặp môn của từng sinh viên
+    - row_weights: số SV của mỗi hàng khi hàng là 1 hồ sơ (nhiều SV cùng tập môn)
+    Returns: (indptr, indices, weights) - weights = số SV học chung 2 môn
+    """
+    counts = np.diff(student_indptr)
+    n_enroll = len(enroll_subject)
+    
+    # Mỗi đăng ký ghép với các đăng ký đứng sau nó trong khối của cùng SV
+    pos = np.arange(n_enroll) - np.repeat(student_indptr[:-1], counts)
+    partners = np.repeat(counts, counts) - pos - 1
+    left = np.repeat(np.arange(n_enroll), partners)
+    step = np.arange(len(left)) - np.repeat(np.cumsum(partners) - partners, partners) + 1
+    a = enroll_subject[left]
+    b = enroll_subject[left + step]
+    weights = None
+    if row_weights is not None:
+        weights = np.repeat(np.repeat(row_weights, counts), partners)
+    return _csr_from_pairs(a, b, n_subjects, weights)
+
+
+def _csr_from_pairs(a, b, n, weights=None):
+    """
+    Dựng đồ thị vô hướng CSR từ danh sách cặp đỉnh (có thể trùng, bất kỳ chiều)
+    - weights: trọng số từng cặp (None = mỗi cặp tính 1)
+    Returns: (indptr, indices, weights) - weights = tổng trọng số của cặp (số SV chung)
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    lo = np.minimum(a, b)
+    hi = np.maximum(a, b)
+    keep = lo != hi
+    
+    # Gộp cặp trùng, cộng trọng số (số SV chung)
+    if weights is None:
+        keys, weights = np.unique(lo[keep] * n + hi[keep], return_counts=True)
+    else:
+        keys, inverse = np.unique(lo[keep] * n + hi[keep], return_inverse=True)
+        weights = np.bincount(inverse.reshape(-1), weights=np.asarray(weights)[keep],
+                              minlength=len(keys)).astype(np.int64)
+    src = keys // n
+    dst = keys % n
+    
+    # Đối xứng hóa rồi sắp theo (src, dst)
+    both_src = np.concatenate([src, dst])
+    both_dst = np.concatenate([dst, src])
+    order = np.lexsort((both_dst, both_src))
+    indptr = _csr_indptr(both_src[order], n)
+    indices = both_dst[order].astype(np.int32)
+    weights = np.concatenate([weights, weights])[order].astype(np.int32)
+    return indptr, indices, weights
+
+
+def _student_profiles(student_indptr, enroll_subject):
+    """
+    Gom các SV có cùng tập môn thành 1 hồ sơ (profile) có trọng số
+    - Mỗi SV thành 1 hàng đệm -1 của ma trận (n_sv x số môn tối đa), lexsort theo hàng
+    Returns: (profile_of[sv], profile_indptr, profile_subjects, profile_sizes)
+    """
+    counts = np.diff(student_indptr)
+    n = len(counts)
+    if n == 0:
+        empty = np.zeros(0, dtype=np.int32)
+        return empty, np.zeros(1, dtype=np.int64), empty, np.zeros(0, dtype=np.int64)
+    width = int(counts.max())
+    rows = np.full((n, width), -1, dtype=np.int32)
+    cols = np.arange(len(enroll_subject)) - np.repeat(student_indptr[:-1], counts)
+    rows[np.repeat(np.arange(n), counts), cols] = enroll_subject
+    
+    # Sắp các hàng rồi đánh số hồ sơ tại chỗ hàng đổi khác hàng trước
+    order = np.lexsort(rows.T[::-1])
+    sorted_rows = rows[order]
+    is_new = np.ones(n, dtype=bool)
+    is_new[1:] = (sorted_rows[1:] != sorted_rows[:-1]).any(axis=1)
+    profile_ids = np.cumsum(is_new) - 1
+    profile_of = np.empty(n, dtype=np.int32)
+    profile_of[order] = profile_ids
+    
+    unique_rows = sorted_rows[is_new]
+    valid = unique_rows >= 0
+    indptr = np.zeros(len(unique_rows) + 1, dtype=np.int64)
+    np.cumsum(valid.sum(axis=1), out=indptr[1:])
+    sizes = np.bincount(profile_ids, minlength=len(unique_rows)).astype(np.int64)
+    return profile_of, indptr, unique_rows[valid].astype(np.int32), sizes
+
+
+def _dsatur(adj, pinned=None, forbidden=None):
+    """
+    Tô màu DSatur trên danh sách kề (màu bắt đầu từ 1), tự chọn engine theo kích thước:
+    đồ thị nhỏ/vừa dùng bitset, đồ thị lớn dùng tập hợp (ma trận bitset tốn n^2/8 byte)
+    - pinned: {đỉnh: màu} tô sẵn, dùng làm hạt giống cho độ bão hòa
+    - forbidden: {đỉnh: tập màu cấm}, bị bỏ qua khi chọn màu nhỏ nhất
+    Returns: list màu theo đỉnh
+    """
+    if len(adj) <= BITSET_MAX_SUBJECTS:
+        return _dsatur_bitset(adj, pinned, forbidden)
+    return _dsatur_sets(adj, pinned, forbidden)
+
+
+def _neighbor_bitsets(adj):
+    """Bitset láng giềng (Python int, bit u = có cạnh tới u) của từng đỉnh"""
+    n = len(adj)
+    if n == 0:
+        return []
+    matrix = np.zeros((n, n), dtype=bool)
+    rows = np.repeat(np.arange(n), [len(nb) for nb in adj])
+    matrix[rows, np.fromiter((u for nb in adj for u in nb), dtype=np.int64,
+                             count=len(rows))] = True
+    packed = np.packbits(matrix, axis=1, bitorder='little')
+    return [int.from_bytes(row.tobytes(), 'little') for row in packed]
+
+
+def _iter_bits(bits):
+    """Duyệt chỉ số các bit bật của 1 bitset theo thứ tự tăng dần"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _dsatur_bitset(adj, pinned=None, forbidden=None):
+    """
+    DSatur trên bitset, cho cùng kết quả với engine tập hợp:
+    - nbr_bits[v]: láng giềng của v; near[c]: các đỉnh kề với ít nhất 1 đỉnh màu c
+    - seen[v]: mặt nạ màu quanh v (bit 0 luôn bật) -> độ bão hòa = số bit bật - 1,
+      màu nhỏ nhất còn trống = bit 0 thấp nhất của seen[v] | mặt nạ màu cấm
+    - Khi tô v màu c chỉ các đỉnh trong nbr_bits[v] & chưa tô & ~near[c] tăng bão hòa
+    Returns: list màu theo đỉnh
+    """
+    n = len(adj)
+    degree = [len(nb) for nb in adj]
+    nbr_bits = _neighbor_bitsets(adj)
+    pinned = pinned or {}
+    forbidden = forbidden or {}
+    colors = [0] * n
+    seen = [1] * n
+    near = defaultdict(int)
+    uncolored = (1 << n) - 1
+    
+    # Đỉnh tô sẵn: cập nhật lớp màu rồi suy ra mặt nạ màu của các đỉnh kề
+    for v, c in pinned.items():
+        colors[v] = c
+        near[c] |= nbr_bits[v]
+        uncolored &= ~(1 << v)
+    for c, bits in near.items():
+        for u in _iter_bits(bits & uncolored):
+            seen[u] |= 1 << c
+    banned_mask = {v: sum(1 << c for c in set(cs)) for v, cs in forbidden.items()}
+    
+    heap = [(-(seen[s].bit_count() - 1), -degree[s], s) for s in range(n) if not colors[s]]
+    heapq.heapify(heap)
+    
+    while heap:
+        _, _, subj = heapq.heappop(heap)
+        if colors[subj]:
+            continue
+        
+        mask = seen[subj] | banned_mask.get(subj, 0)
+        c = ((mask + 1) & ~mask).bit_length() - 1
+        colors[subj] = c
+        uncolored &= ~(1 << subj)
+        
+        # Chỉ đỉnh kề chưa tô và chưa thấy màu c mới tăng độ bão hòa
+        bits = nbr_bits[subj]
+        for nei in _iter_bits(bits & uncolored & ~near[c]):
+            seen[nei] |= 1 << c
+            heapq.heappush(heap, (-(seen[nei].bit_count() - 1), -degree[nei], nei))
+        near[c] |= bits
+    
+    return colors
+
+
+def _dsatur_sets(adj, pinned=None, forbidden=None):
+    """
+    DSatur trên danh sách kề và tập hợp, dùng cho đồ thị lớn
+    Returns: list màu theo đỉnh
+    """
+    n = len(adj)
+    degree = [len(nb) for nb in adj]
+    saturation = [0] * n
+    color_of = dict(pinned or {})
+    forbidden = forbidden or {}
+    colored = set(color_of)
+    
+    # Đỉnh tô sẵn làm tăng độ bão hòa của các đỉnh kề ngay từ đầu
+    for v in colored:
+        for nei in adj[v]:
+            if nei not in colored:
+                saturation[nei] = len({color_of[u] for u in adj[nei] if u in color_of})
+    
+    # Build initial heap: (-saturation, -degree, subject)
+    heap = [(-saturation[s], -degree[s], s) for s in range(n) if s not in colored]
+    heapq.heapify(heap)
+    
+    while heap:
+        _, _, subj = heapq.heappop(heap)
+        if subj in colored:
+            continue
+        
+        # Choose smallest color not used by neighbors (and not forbidden)
+        used = {color_of.get(n) for n in adj[subj] if n in color_of}
+        banned = forbidden.get(subj, ())
+        c = 1
+        while c in used or c in banned:
+            c += 1
+        color_of[subj] = c
+        colored.add(subj)
+        
+        # Update neighbors' saturation and push back
+        for nei in adj[subj]:
+            if nei not in colored:
+                neigh_colors = {color_of.get(n) for n in adj[nei] 
+                               if n in color_of}
+                saturation[nei] = len(neigh_colors)
+                heapq.heappush(heap, (-saturation[nei], -degree[nei], nei))
+    
+    return [color_of[s] for s in range(n)]
+
+
+def _greedy_coloring(adj, order, pinned=None, forbidden=None):
+    """
+    Tô màu tham lam theo thứ tự đỉnh cho trước: mỗi đỉnh nhận màu nhỏ nhất chưa dùng
+    bởi đỉnh kề và không bị cấm (mặt nạ màu kề dạng bitset như engine DSatur)
+    Returns: list màu theo đỉnh
+    """
+    colors = [0] * len(adj)
+    seen = [1] * len(adj)
+    forbidden = forbidden or {}
+    
+    def assign(v, c):
+        colors[v] = c
+        bit = 1 << c
+        for u in adj[v]:
+            seen[u] |= bit
+    
+    for v, c in (pinned or {}).items():
+        assign(v, c)
+    for v in order:
+        if colors[v]:
+            continue
+        mask = seen[v]
+        for c in forbidden.get(v, ()):
+            mask |= 1 << c
+        assign(v, ((mask + 1) & ~mask).bit_length() - 1)
+    return colors
+
+
+def _welsh_powell(adj, pinned=None, forbidden=None):
+    """Welsh-Powell: tô tham lam theo bậc giảm dần"""
+    order = sorted(range(len(adj)), key=lambda v: -len(adj[v]))
+    return _greedy_coloring(adj, order, pinned, forbidden)
+
+
+def _smallest_last(adj, pinned=None, forbidden=None):
+    """
+    Smallest-last: lần lượt gỡ đỉnh có bậc nhỏ nhất trong đồ thị còn lại (hàng đợi
+    theo ngăn bậc), rồi tô tham lam theo thứ tự ngược với thứ tự gỡ
+    """
+    n = len(adj)
+    degree = [len(nb) for nb in adj]
+    buckets = [set() for _ in range(max(degree, default=0) + 1)]
+    for v in range(n):
+        buckets[degree[v]].add(v)
+    removed = [False] * n
+    order = []
+    low = 0
+    
+    for _ in range(n):
+        while not buckets[low]:
+            low += 1
+        v = buckets[low].pop()
+        removed[v] = True
+        order.append(v)
+        for u in adj[v]:
+            if not removed[u]:
+                d = degree[u]
+                buckets[d].discard(u)
+                buckets[d - 1].add(u)
+                degree[u] = d - 1
+        low = max(low - 1, 0)
+    
+    order.reverse()
+    return _greedy_coloring(adj, order, pinned, forbidden)
+
+
+def _rlf(adj, pinned=None, forbidden=None):
+    """
+    Recursive Largest First: dựng từng lớp màu c = 1, 2, ...
+    - Lớp bắt đầu từ các đỉnh cố định màu c (nếu có), U = đỉnh còn có thể thêm vào lớp,
+      W = đỉnh chưa tô nhưng không vào được lớp
+    - Mỗi bước chọn đỉnh trong U có nhiều láng giềng trong W nhất (hòa: ít láng giềng
+      trong U nhất, rồi mã nhỏ nhất); lớp rỗng thì bắt đầu bằng đỉnh nhiều láng giềng
+      trong U nhất. Số láng giềng trong U/W được cập nhật bằng bincount trên CSR
+    Returns: list màu theo đỉnh
+    """
+    n = len(adj)
+    pinned = pinned or {}
+    forbidden = forbidden or {}
+    degree = np.array([len(nb) for nb in adj], dtype=np.int64)
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(degree, out=indptr[1:])
+    indices = np.fromiter((u for nb in adj for u in nb), dtype=np.int64,
+                          count=int(indptr[-1]))
+    
+    def neighbor_counts(vertices):
+        # Số láng giềng thuộc tập vertices của mọi đỉnh
+        counts = degree[vertices]
+        offsets = np.repeat(indptr[vertices] - np.cumsum(counts) + counts, counts)
+        return np.bincount(indices[offsets + np.arange(len(offsets))], minlength=n)
+    
+    colors = np.zeros(n, dtype=np.int64)
+    for v, c in pinned.items():
+        colors[v] = c
+    c = 0
+    
+    while not colors.all():
+        c += 1
+        uncolored = colors == 0
+        members = [v for v, pc in pinned.items() if pc == c]
+        in_u = uncolored.copy()
+        if members:
+            in_u[indices[np.concatenate([np.arange(indptr[v], indptr[v + 1])
+                                         for v in members])]] = False
+        in_u[[v for v, cs in forbidden.items() if c in cs]] = False
+        in_w = uncolored & ~in_u
+        deg_u = neighbor_counts(np.flatnonzero(in_u))
+        deg_w = neighbor_counts(np.flatnonzero(in_w))
+        first = not members
+        
+        while in_u.any():
+            cand = np.flatnonzero(in_u)
+            if first:
+                score = deg_u[cand]
+                first = False
+            else:
+                score = deg_w[cand] * (n + 1) + (n - deg_u[cand])
+            v = int(cand[np.argmax(score)])
+            colors[v] = c
+            in_u[v] = False
+            # Láng giềng của v rời U sang W
+            nb = indices[indptr[v]:indptr[v + 1]]
+            moved = nb[in_u[nb]]
+            in_u[moved] = False
+            in_w[moved] = True
+            delta = neighbor_counts(moved)
+            deg_u -= delta
+            deg_w += delta
+    
+    return colors.tolist()
+
+
+# Chiến lược tô màu cho run_dsatur(): tên -> f(adj, pinned, forbidden) -> list màu
+COLORING_STRATEGIES = {
+    'dsatur': _dsatur,
+    'rlf': _rlf,
+    'smallest_last': _smallest_last,
+    'welsh_powell': _welsh_powell,
+}
+
+
+def _run_coloring_strategy(name, indptr, indices, pinned, forbidden):
+    """Chạy 1 chiến lược tô màu trên đồ thị CSR (dùng được trong tiến trình con)"""
+    import time
+    
+    t0 = time.perf_counter()
+    indices = indices.tolist()
+    indptr = indptr.tolist()
+    adj = [indices[indptr[i]:indptr[i + 1]] for i in range(len(indptr) - 1)]
+    colors = COLORING_STRATEGIES[name](adj, pinned, forbidden)
+    return name, colors, time.perf_counter() - t0
+
+
+def _chain_allowed(chain, colors, a, b, pinned, forbidden):
+    """Đổi chuỗi Kempe (a <-> b) có giữ được ràng buộc ca cố định / ca cấm không"""
+    for u in chain:
+        if u in pinned:
+            return False
+        if (b if colors[u] == a else a) in forbidden.get(u, ()):
+            return False
+    return True
+
+
+def _kempe_chain(adj, colors, starts, c, d, limit):
+    """
+    Tìm chuỗi Kempe (thành phần liên thông trong đồ thị con màu c, d) chứa starts
+    Returns: set đỉnh, hoặc None nếu chuỗi dài hơn limit
+    """
+    chain = set(starts)
+    stack = list(starts)
+    while stack:
+        v = stack.pop()
+        for u in adj[v]:
+            if u not in chain and colors[u] in (c, d):
+                chain.add(u)
+                if len(chain) > limit:
+                    return None
+                stack.append(u)
+    return chain
+
+
+def _repair_coloring(store, colors, pinned=None, forbidden=None,
+                     max_chain=16, max_tries=256):
+    """
+    Sửa cục bộ một cách tô màu cũ (warm start) thay vì tô lại toàn bộ
+    - colors: list màu theo mã môn (0 = môn mới, chưa có ca)
+    - Bỏ màu 1 đầu mút của mỗi cạnh vi phạm, rồi tô lại các môn này bằng
+      DSatur cục bộ; nếu hết màu thì thử đổi chuỗi Kempe ngắn trước khi mở ca mới
+    - pinned / forbidden: như _dsatur, môn cố định không bao giờ bị đổi ca
+    Returns: list màu mới
+    """
+    adj = store.adjacency()
+    n = len(adj)
+    colors = list(colors)
+    degree = np.diff(store.graph_indptr)
+    pinned = pinned or {}
+    forbidden = forbidden or {}
+    
+    # Áp ràng buộc: môn cố định về đúng ca, môn đang ở ca cấm phải xếp lại
+    for v, c in pinned.items():
+        colors[v] = c
+    for v, banned in forbidden.items():
+        if colors[v] in banned and v not in pinned:
+            colors[v] = 0
+    
+    # Cạnh vi phạm: 2 đầu mút cùng màu (duyệt trên mảng CSR)
+    arr = np.asarray(colors, dtype=np.int64)
+    src = np.repeat(np.arange(n), degree)
+    dst = store.graph_indices
+    bad = (src < dst) & (arr[src] == arr[dst]) & (arr[src] > 0)
+    bad_src, bad_dst = src[bad], dst[bad]
+    
+    # Phủ các cạnh vi phạm: ưu tiên bỏ màu đỉnh vi phạm nhiều, bậc nhỏ
+    hits = np.bincount(np.concatenate([bad_src, bad_dst]), minlength=n)
+    for a, b in zip(bad_src.tolist(), bad_dst.tolist()):
+        if colors[a] == 0 or colors[b] == 0:
+            continue
+        key_a = (a in pinned, -hits[a], degree[a], a)
+        key_b = (b in pinned, -hits[b], degree[b], b)
+        colors[a if key_a < key_b else b] = 0
+    
+    pending = [v for v in range(n) if colors[v] == 0]
+    if not pending:
+        return colors
+    max_color = max(colors)
+    
+    def saturation(v):
+        return len({colors[u] for u in adj[v] if colors[u]})
+    
+    # DSatur cục bộ với heap cập nhật lười (độ bão hòa có thể đã tăng)
+    heap = [(-saturation(v), -degree[v], v) for v in pending]
+    heapq.heapify(heap)
+    while heap:
+        neg_sat, neg_deg, v = heapq.heappop(heap)
+        if colors[v]:
+            continue
+        sat = saturation(v)
+        if sat != -neg_sat:
+            heapq.heappush(heap, (-sat, neg_deg, v))
+            continue
+        
+        used = {colors[u] for u in adj[v]}
+        banned = forbidden.get(v, ())
+        c = 1
+        while c in used or c in banned:
+            c += 1
+        
+        if c > max_color:
+            # Thử giải phóng 1 màu cũ bằng cách đổi chuỗi Kempe ngắn, chỉ xét
+            # các màu bị chặn bởi đúng 1 môn kề và giới hạn số lần thử
+            c = 0
+            blockers = defaultdict(list)
+            for u in adj[v]:
+                blockers[colors[u]].append(u)
+            tries = max_tries
+            for a in range(1, max_color + 1):
+                if len(blockers[a]) != 1 or a in banned:
+                    continue
+                starts = blockers[a]
+                for b in range(1, max_color + 1):
+                    if b == a:
+                        continue
+                    tries -= 1
+                    if tries < 0:
+                        break
+                    chain = _kempe_chain(adj, colors, starts, a, b, max_chain)
+                    if chain is None or any(colors[u] == b for u in adj[v] if u in chain):
+                        continue
+                    if not _chain_allowed(chain, colors, a, b, pinned, forbidden):
+                        continue
+                    for u in chain:
+                        colors[u] = b if colors[u] == a else a
+                    c = a
+                    break
+                if c or tries < 0:
+                    break
+            if not c:
+                max_color += 1
+                c = max_color
+        
+        colors[v] = c
+    
+    return colors
+
+
+def _improve_iterated_greedy(store, colors, rng, pinned, forbidden):
+    """
+    Tô tham lam lặp (Culberson): tô first-fit lại theo thứ tự từng lớp màu
+    (đảo ngược / lớp lớn trước / ngẫu nhiên) - không có ràng buộc thì số màu không tăng
+    """
+    adj = store.adjacency()
+    k = max(colors)
+    classes = [[] for _ in range(k + 1)]
+    for v, c in enumerate(colors):
+        if v not in pinned:
+            classes[c].append(v)
+    
+    labels = list(range(1, k + 1))
+    mode = rng.randrange(3)
+    if mode == 0:
+        labels.reverse()
+    elif mode == 1:
+        labels.sort(key=lambda c: -len(classes[c]))
+    else:
+        rng.shuffle(labels)
+    
+    new = [0] * len(colors)
+    for v, c in pinned.items():
+        new[v] = c
+    for label in labels:
+        for v in classes[label]:
+            used = {new[u] for u in adj[v]}
+            banned = forbidden.get(v, ())
+            c = 1
+            while c in used or c in banned:
+                c += 1
+            new[v] = c
+    return new
+
+
+def _improve_drop_class(store, colors, rng, pinned, forbidden):
+    """Bỏ lớp màu cao nhất rồi xếp lại các môn của lớp đó bằng sửa cục bộ (Kempe)"""
+    k = max(colors)
+    if any(c == k for c in pinned.values()):
+        return colors
+    dropped = [0 if c == k else c for c in colors]
+    return _repair_coloring(store, dropped, pinned, forbidden)
+
+
+# Chiến lược cải thiện cho solve(): tên -> f(store, colors, rng, pinned, forbidden)
+IMPROVEMENT_STRATEGIES = {
+    'iterated_greedy': _improve_iterated_greedy,
+    'drop_class': _improve_drop_class,
+}
+
+
+def _encode_strings(strings):
+    """Nén danh sách chuỗi thành (blob uint8 UTF-8, offsets int64)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+class _StringTable:
+    """Dãy chuỗi UTF-8 liền nhau trong 1 buffer, chỉ giải mã phần tử được truy cập"""
+    
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, i):
+        return self.blob[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+# Dữ liệu dùng chung khi xuất hàng loạt, chỉ gán trong tiến trình con (qua initializer);
+# tiến trình chính truyền trực tiếp cho các hàm render
+_bundle_shared = None
+
+BUNDLE_CSV_COLUMNS = ['MSSV', 'Họ Tên', 'Môn', 'Ngày Thi', 'Ca trong ngày', 'Ca toàn bộ']
+
+# Số dòng tối đa của 1 sheet Excel (kể cả dòng tiêu đề)
+EXCEL_MAX_ROWS = 1048576
+
+
+def _init_bundle_worker(shared):
+    global _bundle_shared
+    _bundle_shared = shared
+
+
+def _with_bundle_shared(fn, task):
+    """Chạy fn(dữ liệu chung, task) trong tiến trình con đã khởi tạo bởi _init_bundle_worker"""
+    return fn(_bundle_shared, task)
+
+
+def _ics_escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+
+
+def _ics_fold(line):
+    """Gấp dòng nội dung theo RFC 5545: tối đa 75 octet (UTF-8), dòng tiếp bắt đầu bằng dấu cách"""
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line
+    parts, start, limit = [], 0, 75
+    while len(data) - start > limit:
+        stop = start + limit
+        while data[stop] & 0xC0 == 0x80:  # không cắt giữa ký tự nhiều byte
+            stop -= 1
+        parts.append(data[start:stop].decode('utf-8'))
+        start, limit = stop, 74  # dòng tiếp: 1 octet cho dấu cách đầu dòng
+    parts.append(data[start:].decode('utf-8'))
+    return '\r\n '.join(parts)
+
+
+def _render_ics(events, stamp):
+    """events: list (uid, ngày yyyymmdd, tiêu đề, mô tả) -> nội dung file .ics; stamp: giờ UTC"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//DSatur Pro//Lich thi//VI']
+    for uid, day, summary, description in events:
+        lines += ['BEGIN:VEVENT', f'UID:{uid}', f'DTSTAMP:{stamp}',
+                  f'DTSTART;VALUE=DATE:{day}',
+                  f'SUMMARY:{_ics_escape(summary)}',
+                  f'DESCRIPTION:{_ics_escape(description)}', 'END:VEVENT']
+    lines.append('END:VCALENDAR')
+    return ('\r\n'.join(map(_ics_fold, lines)) + '\r\n').encode('utf-8')
+
+
+def _ics_subject_keys(subjects):
+    """Khóa ổn định của từng môn cho UID sự kiện ICS: băm tên môn (mã môn đổi khi thêm/bớt môn)"""
+    import hashlib
+    return [hashlib.blake2b(s.encode('utf-8'), digest_size=8).hexdigest() for s in subjects]
+
+
+def _render_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(BUNDLE_CSV_COLUMNS)
+    writer.writerows(rows)
+    return buf.getvalue().encode('utf-8-sig')
+
+
+def _bundle_row(shared, mssv, name, code):
+    """1 dòng lịch sinh viên (cột BUNDLE_CSV_COLUMNS); shared chứa subjects, slot_info"""
+    date_str, session, slot, _ = shared['slot_info'][code]
+    return (mssv, name, shared['subjects'][code], date_str,
+            f"Ca {session}" if session > 0 else "",
+            f"Ca {slot}" if slot > 0 else "")
+
+
+def _student_sheet_frame(shared, task):
+    """DataFrame Lich_SinhVien của 1 phần: task = (tên, mssv, họ tên, indptr, mã môn)"""
+    import pandas as pd
+    
+    _, ids, names, indptr, codes = task
+    records = (_bundle_row(shared, mssv, name, c)
+               for k, (mssv, name) in enumerate(zip(ids, names))
+               for c in codes[indptr[k]:indptr[k + 1]])
+    return pd.DataFrame.from_records(records, columns=BUNDLE_CSV_COLUMNS)
+
+
+def _render_excel_shard(shared, task):
+    """
+    Ghi 1 phần lịch sinh viên thành file Excel riêng (chạy trong tiến trình con)
+    Returns: (tên file, bytes)
+    """
+    import pandas as pd
+    
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine='openpyxl') as writer:
+        _student_sheet_frame(shared, task).to_excel(writer, sheet_name='Lich_SinhVien', index=False)
+    return task[0], buf.getvalue()
+
+
+def _render_bundle_shard(shared, task):
+    """
+    Tạo nội dung file cho 1 phân đoạn (chạy trong tiến trình con)
+    - task = ('student', mssv, họ tên, indptr, mã môn) hoặc ('class', mã môn, [(mssv, họ tên)])
+    Returns: list (tên file trong zip, bytes)
+    """
+    fmt, subjects, slot_info, stamp, uid_keys = (shared[k] for k in
+                                                 ('fmt', 'subjects', 'slot_info', 'stamp',
+                                                  'uid_keys'))
+    files = []
+    row = functools.partial(_bundle_row, shared)
+    
+    if task[0] == 'student':
+        _, ids, names, indptr, codes = task
+        for k, (mssv, name) in enumerate(zip(ids, names)):
+            own = codes[indptr[k]:indptr[k + 1]]
+            if fmt == 'csv':
+                data = _render_csv([row(mssv, name, c) for c in own])
+            else:
+                data = _render_ics([(f'{mssv}-{uid_keys[c]}@dsatur', slot_info[c][3],
+                                     f'Thi {subjects[c]} - Ca {slot_info[c][1]}',
+                                     f'{name} ({mssv}) - Ca toàn bộ {slot_info[c][2]}')
+                                    for c in own if slot_info[c][2] > 0], stamp)
+            files.append((f'{mssv}.{fmt}', data))
+    else:
+        _, codes, members = task
+        for c, people in zip(codes, members):
+            safe = re.sub(r'[\\/:*?"<>|\s]+', '_', subjects[c]).strip('_')
+            filename = f'{c + 1:04d}_{safe}.{fmt}'
+            if fmt == 'csv':
+                data = _render_csv([row(mssv, name, c) for mssv, name in people])
+            else:
+                events = []
+                if slot_info[c][2] > 0:
+                    events.append((f'class-{uid_keys[c]}@dsatur', slot_info[c][3],
+                                   f'Thi {subjects[c]} - Ca {slot_info[c][1]}',
+                                   f'{len(people)} sinh viên - Ca toàn bộ {slot_info[c][2]}'))
+                data = _render_ics(events, stamp)
+            files.append((filename, data))
+    
+    return files
+
+
+def _parse_sheet(excel, sheet, info):
+    """
+    Đọc 1 sheet danh sách lớp học phần, ghi số dòng / lý do bỏ qua vào info
+    Returns: DataFrame MaSV/HoTen/ChuongTrinh (MSSV đã lọc) hoặc None
+    """
+    # pandas chỉ được import khi tải file lần đầu (khởi động nhanh)
+    import pandas as pd
+    
+    # Đọc toàn bộ sheet như string
+    df = pd.read_excel(excel, sheet_name=sheet, header=None, 
+                      dtype=str, engine='openpyxl')
+    df = df.fillna('')
+    
+    # Tìm dòng header (chứa "Mã SV" hoặc "MSSV")
+    header_row = None
+    for idx in range(min(5, len(df))):
+        row_text = ' '.join(df.iloc[idx].astype(str).str.lower().tolist())
+        if 'mã sv' in row_text or 'mssv' in row_text or 'ma sv' in row_text:
+            header_row = idx
+            break
+    
+    if header_row is None:
+        # Thử đọc sheet như 1 cột danh sách MSSV
+        df2 = pd.read_excel(excel, sheet_name=sheet, dtype=str, engine='openpyxl')
+        if df2.shape[1] >= 1:
+            col0 = df2.columns[0]
+            tmp = df2[[col0]].dropna()
+            tmp.columns = ['MaSV']
+            tmp['HoTen'] = 'N/A'
+            tmp['MaSV'] = tmp['MaSV'].astype(str).str.strip()
+            tmp = tmp.loc[tmp['MaSV'].str.match(r'^\d+$', na=False)]
+            tmp['ChuongTrinh'] = sheet
+            info.update(subject=sheet, rows=len(df2), kept=len(tmp),
+                        reason='Không có header MSSV')
+            return tmp
+        else:
+            info['reason'] = 'Sheet trống'
+            return None
+    
+    # Lấy tên môn học (dòng đầu tiên hoặc tên sheet)
+    subject_name = sheet
+    if header_row > 0:
+        first_cell = str(df.iloc[0, 0]).strip()
+        if len(first_cell) > 0:
+            subject_name = first_cell
+    
+    # Đặt header
+    df.columns = df.iloc[header_row]
+    df = df.iloc[header_row + 1:].reset_index(drop=True)
+    
+    # Tìm cột Mã SV và Họ Tên
+    masv_col = None
+    hoten_col = None
+    
+    for col in df.columns:
+        col_str = str(col).lower().strip()
+        if 'mã sv' in col_str or 'mssv' in col_str or 'ma sv' in col_str:
+            masv_col = col
+        if 'họ' in col_str and 'tên' in col_str:
+            hoten_col = col
+        elif 'tên' in col_str and hoten_col is None:
+            hoten_col = col
+    
+    info.update(subject=subject_name, rows=len(df))
+    if masv_col is None:
+        info['reason'] = 'Không có cột MSSV'
+        return None
+    
+    # Lọc dữ liệu
+    if hoten_col:
+        df_clean = df[[masv_col, hoten_col]].copy()
+        df_clean.columns = ['MaSV', 'HoTen']
+    else:
+        df_clean = df[[masv_col]].copy()
+        df_clean.columns = ['MaSV']
+        df_clean['HoTen'] = 'N/A'
+    
+    df_clean['MaSV'] = df_clean['MaSV'].astype(str).str.strip()
+    df_clean = df_clean.loc[df_clean['MaSV'].str.len() > 0].copy()
+    info['rows'] = len(df_clean)
+    mask_numeric = df_clean['MaSV'].str.match(r'^\d+$', na=False)
+    df_clean = df_clean.loc[mask_numeric].copy()
+    
+    info['kept'] = len(df_clean)
+    if len(df_clean) == 0:
+        return None
+    df_clean['ChuongTrinh'] = subject_name
+    return df_clean
+
+
+def _iter_workbook_sheets(filepath):
+    """
+    Đọc lần lượt từng sheet của 1 file Excel (generator, dừng được giữa chừng)
+    Yields: (info {file, sheet, subject, rows, kept, reason}, DataFrame hoặc None)
+    """
+    import pandas as pd
+    
+    excel = pd.ExcelFile(filepath, engine='openpyxl')
+    for sheet in excel.sheet_names:
+        info = {'file': os.path.basename(filepath), 'sheet': sheet, 'subject': None,
+                'rows': 0, 'kept': 0, 'reason': None}
+        try:
+            frame = _parse_sheet(excel, sheet, info)
+        except Exception as e:
+            print(f"Lỗi đọc sheet {sheet}: {e}")
+            info['reason'] = f"Lỗi: {e}"
+            frame = None
+        yield info, frame
+
+
+def _read_workbook_sheets(filepath):
+    """Đọc hết 1 file (chạy trong tiến trình con). Returns: ([(info, frame)], lỗi hoặc None)"""
+    try:
+        return list(_iter_workbook_sheets(filepath)), None
+    except Exception as e:
+        return [], str(e)
+
+
+def _normalize_labels(values):
+    """Chuẩn hóa nhãn để so gần đúng: Unicode NFC, bỏ khoảng trắng thừa, không phân biệt hoa thường"""
+    import unicodedata
+    return [' '.join(unicodedata.normalize('NFC', str(v)).split()).casefold() for v in values]
+
+
+def _quality_report(data, sheet_stats, store, max_items=QUALITY_MAX_ITEMS):
+    """
+    Kiểm tra chất lượng dữ liệu đăng ký bằng group-by vector hóa (chạy 1 lần khi tải)
+    - name_conflicts: MSSV có nhiều họ tên khác nhau (đã chuẩn hóa khoảng trắng/hoa thường)
+    - dropped_rows / skipped_sheets: số dòng bị loại theo sheet, sheet bị bỏ qua
+    - subject_collisions: 1 tên môn được lấy từ nhiều sheet trong cùng 1 file
+    - similar_subjects: tên môn chỉ khác nhau về hoa thường/khoảng trắng
+    - duplicate_rosters: các môn có danh sách SV giống hệt nhau
+    Mỗi danh sách giữ tối đa max_items phần tử, số lượng đầy đủ ở report['counts']
+    """
+    import pandas as pd
+    
+    # Họ tên: chuẩn hóa trên các giá trị khác nhau (factorize) thay vì từng dòng
+    names = data['HoTen'].fillna('N/A').astype(str).to_numpy()
+    name_codes, name_values = pd.factorize(names)
+    normalized = np.asarray(_normalize_labels(name_values), dtype=object)
+    norm_codes, _ = pd.factorize(normalized)
+    missing = np.isin(normalized, ['', 'n/a'])
+    
+    mssv = data['MaSV'].astype(str).to_numpy()
+    known = ~missing[name_codes]
+    pairs = pd.DataFrame({'mssv': mssv[known], 'name': norm_codes[name_codes][known]})
+    counts = pairs.drop_duplicates()['mssv'].value_counts()
+    conflicted = np.sort(counts.index[counts > 1].to_numpy())
+    
+    shown = np.isin(mssv, conflicted[:max_items]) & known
+    raw = pd.DataFrame({'mssv': mssv[shown], 'name': names[shown]}).drop_duplicates()
+    name_conflicts = [{'mssv': str(s), 'names': sorted(group.tolist())}
+                      for s, group in raw.groupby('mssv', sort=True)['name']]
+    
+    # Dòng bị loại / sheet bị bỏ qua theo từng sheet
+    sheets = pd.DataFrame(sheet_stats,
+                          columns=['file', 'sheet', 'subject', 'rows', 'kept', 'reason'])
+    sheets['dropped'] = sheets['rows'] - sheets['kept']
+    dropped = sheets.loc[(sheets['kept'] > 0) & (sheets['dropped'] > 0)]
+    skipped = sheets.loc[sheets['reason'].notna() & (sheets['kept'] == 0)]
+    
+    used = sheets.loc[sheets['kept'] > 0]
+    per_subject = used.groupby(['file', 'subject'])['sheet'].agg(list)
+    collisions = per_subject[per_subject.str.len() > 1]
+    
+    subject_norm = pd.Series(_normalize_labels(store.subjects))
+    groups = subject_norm.groupby(subject_norm).indices
+    similar = [[store.subjects[i] for i in idx] for idx in groups.values() if len(idx) > 1]
+    
+    # Danh sách SV của mỗi môn đã được sắp tăng dần (CSR) nên so bằng bytes
+    rosters = defaultdict(list)
+    indptr = store.subject_indptr
+    for c in range(len(store.subjects)):
+        rosters[store.subject_students[indptr[c]:indptr[c + 1]].tobytes()].append(c)
+    duplicate_rosters = [[store.subjects[c] for c in codes]
+                         for codes in rosters.values() if len(codes) > 1]
+    
+    return {
+        'counts': {
+            'name_conflicts': len(conflicted),
+            'dropped_rows': int(dropped['dropped'].sum()),
+            'skipped_sheets': len(skipped),
+            'subject_collisions': len(collisions),
+            'similar_subjects': len(similar),
+            'duplicate_rosters': len(duplicate_rosters)
+        },
+        'name_conflicts': name_conflicts,
+        'dropped_rows': dropped[['file', 'sheet', 'rows', 'dropped']].head(max_items)
+                        .to_dict('records'),
+        'skipped_sheets': skipped[['file', 'sheet', 'reason']].head(max_items)
+                          .to_dict('records'),
+        'subject_collisions': [{'file': f, 'subject': s, 'sheets': v}
+                               for (f, s), v in collisions.head(max_items).items()],
+        'similar_subjects': similar[:max_items],
+        'duplicate_rosters': duplicate_rosters[:max_items]
+    }
+
+
+def _resolve_workers(workers):
+    """Số tiến trình con: workers nếu có, ngược lại số CPU (Windows giới hạn 61)"""
+    return workers or min(os.cpu_count() or 1, 61)
+
+
+def _bounded_map(executor, fn, tasks, window):
+    """Như executor.map nhưng chỉ giữ tối đa `window` tác vụ đang chạy (bộ nhớ có giới hạn)"""
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _kempe_components(adj, colors, members, a, b):
+    """Các chuỗi Kempe (màu a, b) có chứa ít nhất 1 đỉnh trong members"""
+    seen = set()
+    for v in members:
+        if v in seen:
+            continue
+        seen.add(v)
+        comp = [v]
+        stack = [v]
+        while stack:
+            x = stack.pop()
+            for u in adj[x]:
+                if u not in seen and (colors[u] == a or colors[u] == b):
+                    seen.add(u)
+                    comp.append(u)
+                    stack.append(u)
+        yield comp
+
+
+def _balance_loads(adj, colors, sizes, max_rounds=None, pinned=None, forbidden=None):
+    """
+    Cân bằng tải (tổng số SV) giữa các ca bằng đổi chuỗi Kempe, không tăng số ca
+    - Mỗi vòng: lấy ca nặng nhất, thử đổi 1 chuỗi Kempe với ca nhẹ hơn sao cho
+      tổng bình phương tải giảm; tải được cập nhật tăng dần sau mỗi lần đổi
+    - Bỏ qua chuỗi chứa môn cố định hoặc đưa môn vào ca cấm
+    Returns: (colors, loads, số lần đổi)
+    """
+    colors = list(colors)
+    pinned = pinned or {}
+    forbidden = forbidden or {}
+    k = max(colors) if colors else 0
+    loads = [0] * (k + 1)
+    members = [set() for _ in range(k + 1)]
+    for v, c in enumerate(colors):
+        if c:
+            loads[c] += sizes[v]
+            members[c].add(v)
+    
+    if max_rounds is None:
+        max_rounds = 10 * k
+    moves = 0
+    stuck = set()
+    dead = set()  # cặp (a, b) đã biết không có chuỗi cải thiện (còn đúng đến khi a/b thay đổi)
+    
+    for _ in range(max_rounds):
+        heavy = [c for c in range(1, k + 1) if c not in stuck]
+        if not heavy:
+            break
+        a = max(heavy, key=lambda c: loads[c])
+        
+        best = None
+        for b in sorted(range(1, k + 1), key=lambda c: loads[c]):
+            gap = loads[a] - loads[b]
+            if gap <= 0:
+                break
+            if (a, b) in dead:
+                continue
+            for comp in _kempe_components(adj, colors, list(members[a]), a, b):
+                d = sum(sizes[v] if colors[v] == a else -sizes[v] for v in comp)
+                # Tổng bình phương giảm khi 0 < d < gap, tốt nhất khi d gần gap / 2
+                if 0 < d < gap and (best is None or abs(gap - 2 * d) < best[0]) and \
+                        _chain_allowed(comp, colors, a, b, pinned, forbidden):
+                    best = (abs(gap - 2 * d), b, comp, d)
+            if best is not None:
+                break
+            dead.add((a, b))
+        
+        if best is None:
+            stuck.add(a)
+            continue
+        
+        _, b, comp, d = best
+        for v in comp:
+            old, new = colors[v], (b if colors[v] == a else a)
+            colors[v] = new
+            members[old].discard(v)
+            members[new].add(v)
+        loads[a] -= d
+        loads[b] += d
+        moves += 1
+        stuck.clear()
+        dead = {p for p in dead if a not in p and b not in p}
+    
+    return colors, loads[1:], moves
+
+
+def _spread_penalty_matrix(k, per_day, same_day_weight, consecutive_weight):
+    """Ma trận phạt giữa 2 vị trí ca (1..k): cùng ngày, và thêm phạt nếu liền kề trong ngày"""
+    pos = np.arange(k)
+    day = pos // per_day
+    same_day = (day[:, None] == day[None, :]) & (pos[:, None] != pos[None, :])
+    consecutive = same_day & (np.abs(pos[:, None] - pos[None, :]) == 1)
+    return same_day * same_day_weight + consecutive * consecutive_weight
+
+
+def _optimize_spread(coenroll, penalty, time_limit, allowed=None):
+    """
+    Tìm hoán vị lớp màu -> vị trí ca giảm tổng phạt bằng tìm kiếm cục bộ đổi chỗ 2 lớp
+    - coenroll[a, b]: số SV thi cả lớp màu a và b; penalty[p, q]: phạt giữa 2 vị trí
+    - allowed[c, p]: lớp c được đặt ở vị trí p (ràng buộc ca cố định / ca cấm)
+    - Delta của mọi phép đổi (a, b) với 1 lớp a được tính vector hóa trong O(k^2)
+    Returns: (pos, chi phí ban đầu, chi phí cuối)
+    """
+    import time
+    deadline = time.perf_counter() + time_limit
+    k = len(coenroll)
+    pos = np.arange(k)
+    Q = penalty[:, pos]  # Q[p, c] = phạt giữa vị trí p và vị trí hiện tại của lớp c
+    cost = lambda: float((coenroll * penalty[np.ix_(pos, pos)]).sum()) / 2
+    start_cost = cost()
+    
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for a in range(k):
+            pa = pos[a]
+            D = coenroll[a][None, :] - coenroll
+            E = Q[pos] - Q[pa][None, :]
+            delta = (D * E).sum(axis=1) + 2 * coenroll[a] * penalty[pa, pos]
+            delta[a] = 0
+            if allowed is not None:
+                ok = allowed[a, pos] & allowed[np.arange(k), pa]
+                delta[~ok] = np.inf
+            b = int(np.argmin(delta))
+            if delta[b] < -1e-9:
+                pos[a], pos[b] = pos[b], pos[a]
+                Q[:, a] = penalty[:, pos[a]]
+                Q[:, b] = penalty[:, pos[b]]
+                improved = True
+            if time.perf_counter() >= deadline:
+                break
+    
+    return pos, start_cost, cost()
+
+
+class EnrollmentStore:
+    """
+    Kho dữ liệu đăng ký dạng cột (mảng số nguyên) sau khi tải file
+    - MSSV giữ nguyên dạng chuỗi (kể cả số 0 ở đầu), mã SV = thứ tự MSSV tăng dần;
+      tên SV và tên môn lưu dạng mã phân loại (categorical)
+    - Đăng ký lưu thành cặp mảng (sv, môn) sắp theo sinh viên
+    """
+    
+    def __init__(self, student_ids, name_codes, names, subjects,
+                 enroll_student, enroll_subject, graph=None):
+        self.student_ids = student_ids          # unicode[n_sv] (độ dài cố định), tăng dần
+        self.name_codes = name_codes            # int32[n_sv] -> names
+        self.names = names                      # [họ tên duy nhất]
+        self.subjects = subjects                # [tên môn], tăng dần
+        self.enroll_student = enroll_student    # int32[n_dk], sắp theo (sv, môn)
+        self.enroll_subject = enroll_subject    # int32[n_dk]
+        self.subject_index = {s: i for i, s in enumerate(subjects)}
+        
+        # CSR sinh viên -> môn
+        self.student_indptr = _csr_indptr(enroll_student, len(student_ids))
+        
+        # CSR môn -> sinh viên
+        order = np.argsort(enroll_subject, kind='stable')
+        self.subject_students = enroll_student[order]
+        self.subject_indptr = _csr_indptr(enroll_subject[order], len(subjects))
+        self.subject_sizes = np.diff(self.subject_indptr)
+        
+        # Đồ thị xung đột CSR: dựng trên các hồ sơ tập môn có trọng số thay vì từng SV;
+        # chỉ kho không có sinh viên (from_graph) truyền sẵn đồ thị
+        self._profiles = None
+        if graph is None:
+            _, indptr, profile_subjects, sizes = self.profiles()
+            graph = _build_conflict_graph(indptr, profile_subjects, len(subjects), sizes)
+        self.graph_indptr, self.graph_indices, self.graph_weights = graph
+        self._adjacency = None
+        self._fingerprint = None
+    
+    # Các mảng được ghi nguyên trạng vào snapshot
+    ARRAY_FIELDS = ('student_ids', 'name_codes', 'enroll_student', 'enroll_subject',
+                    'student_indptr', 'subject_students', 'subject_indptr',
+                    'graph_indptr', 'graph_indices', 'graph_weights')
+    
+    def to_arrays(self):
+        """Toàn bộ dữ liệu của kho dưới dạng {tên: mảng numpy} (chuỗi đã mã hóa)"""
+        arrays = {name: getattr(self, name) for name in self.ARRAY_FIELDS}
+        arrays['names_blob'], arrays['names_offsets'] = _encode_strings(self.names)
+        arrays['subjects_blob'], arrays['subjects_offsets'] = _encode_strings(self.subjects)
+        return arrays
+    
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Dựng lại kho từ các mảng (có thể là view trên mmap), không tính lại CSR/đồ thị"""
+        store = cls.__new__(cls)
+        for name in cls.ARRAY_FIELDS:
+            setattr(store, name, arrays[name])
+        # Tên môn cần ngay cho tra cứu; họ tên SV chỉ giải mã khi truy cập
+        store.subjects = list(_StringTable(arrays['subjects_blob'], arrays['subjects_offsets']))
+        store.names = _StringTable(arrays['names_blob'], arrays['names_offsets'])
+        store.subject_index = {s: i for i, s in enumerate(store.subjects)}
+        store.subject_sizes = np.diff(store.subject_indptr)
+        store._adjacency = None
+        store._profiles = None
+        store._fingerprint = None
+        return store
+    
+    def detach(self):
+        """
+        Chép các mảng đang map từ file snapshot vào RAM rồi đóng mmap, để file có thể
+        bị ghi đè (Windows không cho thay thế file đang được map)
+        Returns: True nếu không còn giữ mmap
+        """
+        mm = getattr(self, '_mmap', None)
+        if mm is None:
+            return True
+        for name in self.ARRAY_FIELDS:
+            setattr(self, name, np.array(getattr(self, name)))
+        if isinstance(self.names, _StringTable):
+            self.names = _StringTable(np.array(self.names.blob), np.array(self.names.offsets))
+        self._mmap = None
+        self._mmap_path = None
+        try:
+            mm.close()
+        except BufferError:
+            # Vẫn còn view ngoài kho (người đọc đang giữ): mmap đóng khi view được giải phóng
+            return False
+        return True
+    
+    @classmethod
+    def from_graph(cls, subjects, src, dst):
+        """Tạo kho chỉ có đồ thị (không có sinh viên), ví dụ từ file DIMACS"""
+        empty = np.zeros(0, dtype=np.int32)
+        return cls(
+            student_ids=np.zeros(0, dtype='<U1'),
+            name_codes=empty,
+            names=[],
+            subjects=subjects,
+            enroll_student=empty,
+            enroll_subject=empty,
+            graph=_csr_from_pairs(src, dst, len(subjects))
+        )
+    
+    @classmethod
+    def from_frame(cls, data):
+        """Tạo kho từ DataFrame (MaSV, HoTen, ChuongTrinh) đã lọc và bỏ trùng"""
+        import pandas as pd
+        
+        student_cat = pd.Categorical(data['MaSV'].astype(str).to_numpy())
+        student_codes = student_cat.codes.astype(np.int64)
+        student_ids = np.asarray(student_cat.categories, dtype=str)
+        
+        subject_cat = pd.Categorical(data['ChuongTrinh'].to_numpy())
+        subject_codes = subject_cat.codes.astype(np.int32)
+        
+        # Giữ họ tên gặp đầu tiên của mỗi sinh viên
+        _, first = np.unique(student_codes, return_index=True)
+        name_cat = pd.Categorical(data['HoTen'].fillna('N/A').to_numpy()[first])
+        
+        order = np.lexsort((subject_codes, student_codes))
+        return cls(
+            student_ids=student_ids,
+            name_codes=name_cat.codes.astype(np.int32),
+            names=[str(n) for n in name_cat.categories],
+            subjects=[str(s) for s in subject_cat.categories],
+            enroll_student=student_codes[order].astype(np.int32),
+            enroll_subject=subject_codes[order]
+        )
+    
+    @property
+    def n_students(self):
+        return len(self.student_ids)
+    
+    @property
+    def n_edges(self):
+        return len(self.graph_indices) // 2
+    
+    def fingerprint(self):
+        """
+        Dấu vân tay (hex) của đồ thị xung đột: băm số môn và cấu trúc CSR (không tính
+        trọng số, tên môn) - 2 kho cùng đồ thị theo mã môn cho cùng kết quả tô màu
+        """
+        if self._fingerprint is None:
+            import hashlib
+            
+            h = hashlib.blake2b(digest_size=16)
+            h.update(np.int64(len(self.subjects)).tobytes())
+            h.update(np.ascontiguousarray(self.graph_indptr, dtype=np.int64).tobytes())
+            h.update(np.ascontiguousarray(self.graph_indices, dtype=np.int32).tobytes())
+            self._fingerprint = h.hexdigest()
+        return self._fingerprint
+    
+    def profiles(self):
+        """
+        Hồ sơ tập môn (tính 1 lần, không lưu trong snapshot)
+        Returns: (profile_of[sv], profile_indptr, profile_subjects, profile_sizes)
+        """
+        if self._profiles is None:
+            self._profiles = _student_profiles(self.student_indptr, self.enroll_subject)
+        return self._profiles
+    
+    def profile_rows(self, slots):
+        """
+        Cặp (hồ sơ, ca) đã sắp theo hồ sơ rồi ca, bỏ các môn chưa xếp (ca 0)
+        - slots: mảng ca theo mã môn
+        Returns: (profile, slot) mảng int64
+        """
+        _, indptr, subjects, _ = self.profiles()
+        profile = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        slot = np.asarray(slots)[subjects].astype(np.int64)
+        mask = slot > 0
+        profile = profile[mask]
+        slot = slot[mask]
+        order = np.lexsort((slot, profile))
+        return profile[order], slot[order]
+    
+    def student_name(self, i):
+        """Họ tên của sinh viên có mã nội bộ i"""
+        return self.names[self.name_codes[i]]
+    
+    def subjects_of(self, i):
+        """Mảng mã môn của sinh viên có mã nội bộ i"""
+        return self.enroll_subject[self.student_indptr[i]:self.student_indptr[i + 1]]
+    
+    def iter_edges(self, block_rows=4096):
+        """
+        Duyệt các cạnh (a < b) theo từng khối đỉnh, không dựng toàn bộ danh sách cạnh
+        Yields: (src, dst, weight) - các mảng numpy của 1 khối
+        """
+        n = len(self.subjects)
+        for start in range(0, n, block_rows):
+            stop = min(start + block_rows, n)
+            lo, hi = self.graph_indptr[start], self.graph_indptr[stop]
+            src = np.repeat(np.arange(start, stop), np.diff(self.graph_indptr[start:stop + 1]))
+            dst = self.graph_indices[lo:hi]
+            upper = src < dst
+            yield src[upper], dst[upper], self.graph_weights[lo:hi][upper]
+    
+    def adjacency(self):
+        """Danh sách kề (list of list) dùng cho các vòng lặp thuần Python"""
+        if self._adjacency is None:
+            indices = self.graph_indices.tolist()
+            indptr = self.graph_indptr.tolist()
+            self._adjacency = [indices[indptr[i]:indptr[i + 1]]
+                               for i in range(len(self.subjects))]
+        return self._adjacency
+
+
+class ScheduleSnapshot:
+    """
+    Ảnh chụp bất biến của 1 lịch thi: kho dữ liệu (dùng chung, chỉ đọc), ca thi theo
+    mã môn, thời khóa biểu CSR ca -> môn và bảng ca -> (ngày, ca trong ngày), kèm
+    thời gian tô màu và báo cáo chất lượng dữ liệu của đúng lần tải/xếp lịch đó.
+    Backend công bố lịch hiện hành dưới dạng ảnh chụp để người đọc không cần khóa;
+    cũng dùng để so sánh các lần chạy
+    """
+    __slots__ = ('store', 'schedule', 'slot_of', 'slot_indptr', 'slot_subjects',
+                 'slot_table', 'max_exams_per_day', 'start_date', 'strategy_timings',
+                 'quality_report', 'created')
+    
+    def __init__(self, store, slot_of, slot_table, max_exams_per_day, start_date,
+                 strategy_timings=None, quality_report=None):
+        slot_of = np.array(slot_of, dtype=np.int32)
+        total_slots = int(slot_of.max()) if len(slot_of) else 0
+        
+        # Thời khóa biểu theo ca (CSR): môn của ca k, nhiều SV trước
+        if store is not None:
+            order = np.lexsort((np.arange(len(slot_of)), -store.subject_sizes, slot_of))
+            order = order[slot_of[order] > 0]
+            schedule = {store.subjects[i]: int(slot_of[i])
+                        for i in np.flatnonzero(slot_of).tolist()}
+        else:
+            order = np.zeros(0, dtype=np.int64)
+            schedule = {}
+        slot_indptr = _csr_indptr(slot_of[order], total_slots + 1)
+        slot_subjects = order.astype(np.int32)
+        for array in (slot_of, slot_indptr, slot_subjects):
+            array.flags.writeable = False
+        
+        for name, value in (('store', store), ('schedule', MappingProxyType(schedule)),
+                            ('slot_of', slot_of), ('slot_indptr', slot_indptr),
+                            ('slot_subjects', slot_subjects),
+                            ('slot_table', tuple(slot_table)),
+                            ('max_exams_per_day', max_exams_per_day),
+                            ('start_date', start_date),
+                            ('strategy_timings', MappingProxyType(dict(strategy_timings or {}))),
+                            ('quality_report', quality_report),
+                            ('created', datetime.now())):
+            object.__setattr__(self, name, value)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("ScheduleSnapshot không thể thay đổi")
+    
+    @property
+    def subjects(self):
+        return self.store.subjects if self.store is not None else []
+    
+    def subjects_in_slot(self, slot):
+        """Mảng mã môn thi trong ca slot"""
+        return self.slot_subjects[self.slot_indptr[slot]:self.slot_indptr[slot + 1]]
+    
+    def slot_label(self, code):
+        """(ca, nhãn ngày, ca trong ngày) của môn có mã code ((0, '', 0) = chưa xếp)"""
+        slot = int(self.slot_of[code])
+        _, session, date_str = self.slot_table[slot]
+        return slot, date_str, session
+
+
+def _writer(method):
+    """Phương thức ghi của backend: giữ khóa ghi (mỗi lúc 1 luồng ghi, người đọc không chờ)"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._write_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SolveCache:
+    """
+    Bộ nhớ đệm kết quả tô màu: khóa = dấu vân tay đồ thị + chiến lược + ràng buộc
+    (theo mã môn). Giữ tối đa max_entries kết quả trong RAM (LRU); nếu có directory
+    thì ghi thêm mỗi kết quả thành 1 file .npz để dùng lại giữa các phiên
+    """
+    
+    def __init__(self, max_entries=SOLVE_CACHE_SIZE, directory=None):
+        from collections import OrderedDict
+        
+        self.max_entries = max_entries
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+    
+    @staticmethod
+    def make_key(store, strategy, pinned, forbidden):
+        """Khóa chuẩn hóa (chuỗi hex) cho 1 lần tô màu"""
+        import hashlib
+        
+        options = json.dumps({
+            'graph': store.fingerprint(),
+            'strategy': strategy,
+            'pinned': sorted(pinned.items()),
+            'forbidden': sorted((v, sorted(cs)) for v, cs in forbidden.items() if cs)
+        })
+        return hashlib.blake2b(options.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+    
+    def get(self, key):
+        """(màu theo mã môn, tên chiến lược thắng) hoặc None nếu chưa có"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None and self.directory and os.path.exists(self._path(key)):
+            try:
+                with np.load(self._path(key)) as data:
+                    entry = (data['colors'].tolist(), str(data['winner']))
+            except Exception:
+                entry = None  # file hỏng: coi như chưa có, sẽ ghi đè
+            if entry is not None:
+                self._remember(key, entry)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+    
+    def put(self, key, colors, winner):
+        entry = (list(colors), winner)
+        self._remember(key, entry)
+        if self.directory:
+            # Ghi file tạm rồi đổi tên để tiến trình khác không đọc phải file dở
+            tmp = self._path(key) + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.savez(f, colors=np.array(entry[0], dtype=np.int32),
+                         winner=np.array(winner))
+            os.replace(tmp, self._path(key))
+    
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Xóa bộ đệm trong RAM (file trên đĩa giữ nguyên)"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self):
+        return len(self._entries)
 
 
 class ExamSchedulerBackend:
@@ -12,348 +1478,1162 @@ class ExamSchedulerBackend:
     
     def __init__(self):
         # Dữ liệu
-        self.data = None
-        self.subjects = []
-        self.student_subjects = defaultdict(set)  # {MSSV: {mon1, mon2, ...}}
-        self.subject_students = defaultdict(set)  # {mon: {sv1, sv2, ...}}
-        self.conflict_graph = defaultdict(set)    # {mon: {mon_xung_dot, ...}}
-        self.schedule = {}                         # {mon: ca_thi}
-        self.schedule_by_day = {}                  # {ngay: {ca: {subject, students, slot}}}
+        self.store = None                          # EnrollmentStore
+        self.schedule = {}                         # {mon: ca_thi} - trạng thái làm việc của luồng ghi
+        self.quality_report = None                 # báo cáo chất lượng dữ liệu lần tải gần nhất
+        self.previous_snapshot = None              # lịch trước lần chạy DSatur gần nhất (để so sánh)
+        self._solved_snapshot = None               # lịch đã xếp gần nhất (không đổi khi tải lại dữ liệu)
+        self.strategy_timings = {}                 # {chiến lược: {'seconds', 'slots'}} lần tô màu gần nhất
+        self.solve_cache = SolveCache()            # kết quả tô màu đã tính (xem SolveCache)
+        
+        # Ràng buộc xếp lịch (theo tên môn, giữ qua các lần tải lại dữ liệu)
+        self.pinned = {}                           # {mon: ca cố định}
+        self.forbidden = {}                        # {mon: {ca cấm}}
+        self.forbidden_days = {}                   # {mon: {ngày cấm, tính từ 1}}
         
         # Cấu hình
         self.max_exams_per_day = 2
         self.start_date = datetime.now()
+        
+        # Lịch công bố cho người đọc: luồng ghi dựng ảnh chụp mới rồi gán 1 lần (nguyên tử),
+        # người đọc lấy ảnh hiện hành không cần khóa
+        self._published = ScheduleSnapshot(None, [], [(None, 0, "")],
+                                           self.max_exams_per_day, self.start_date)
+        self._local = threading.local()            # ảnh chụp được ghim bởi read_view()
+        self._write_lock = threading.RLock()
+    
+    def _view(self):
+        """Ảnh chụp lịch để đọc: ảnh đang ghim trong luồng hiện tại, ngược lại ảnh công bố"""
+        return getattr(self._local, 'view', None) or self._published
+    
+    @contextmanager
+    def read_view(self):
+        """
+        Ghim 1 ảnh chụp lịch cho mọi truy vấn trong khối with của luồng hiện tại,
+        để nhiều truy vấn liên tiếp (hiển thị, xuất file) nhìn thấy cùng 1 lịch
+        """
+        previous = getattr(self._local, 'view', None)
+        view = self._view()
+        self._local.view = view
+        try:
+            yield view
+        finally:
+            self._local.view = previous
+    
+    # Thời khóa biểu theo ca của lịch công bố (chỉ đọc), xem ScheduleSnapshot
+    @property
+    def slot_of(self):
+        return self._view().slot_of
+    
+    @property
+    def slot_indptr(self):
+        return self._view().slot_indptr
+    
+    @property
+    def slot_subjects(self):
+        return self._view().slot_subjects
+    
+    @property
+    def slot_table(self):
+        return self._view().slot_table
+    
+    @property
+    def subjects(self):
+        """Danh sách môn (mã nội bộ = chỉ số trong danh sách)"""
+        return self.store.subjects if self.store is not None else []
+    
+    def load_excel_file(self, filepath, on_progress=None):
+        """
+        Đọc file Excel chứa danh sách lớp học phần
+        - on_progress(event): tiến trình từng sheet (xem iter_load_excel), trả về False để hủy
+        Returns: (success: bool, message: str, stats: dict)
+        """
+        success, message, stats = self.load_excel_files([filepath], workers=1,
+                                                         on_progress=on_progress)
+        if not success:
+            if stats and stats['files'][0]['error']:
+                message = f"Lỗi đọc file: {stats['files'][0]['error']}"
+            return False, message, None
+        return True, "Tải file thành công!", stats
+    
+    def load_excel_files(self, filepaths, workers=None, on_progress=None, keep_partial=False):
+        """
+        Đọc và gộp nhiều file Excel (mỗi khoa 1 file) thành 1 bộ dữ liệu đăng ký
+        - Các file được đọc song song trên nhiều tiến trình (workers=1: tuần tự)
+        - Bỏ trùng cặp (MaSV, môn) giữa các file bằng băm 64-bit từng dòng,
+          file đứng trước được giữ (không concat + drop_duplicates trên toàn bảng)
+        - on_progress(event): nhận sự kiện của iter_load_excel, trả về False để hủy
+        Returns: (success: bool, message: str, stats: dict) - stats['files'] thống kê từng file
+        """
+        cancel = threading.Event()
+        try:
+            for event in self.iter_load_excel(filepaths, workers, cancel, keep_partial):
+                if event['type'] == 'done':
+                    return event['success'], event['message'], event['stats']
+                if on_progress is not None and on_progress(event) is False:
+                    cancel.set()
+        except Exception as e:
+            return False, f"Lỗi đọc file: {str(e)}", None
+    
+    def iter_load_excel(self, filepaths, workers=None, cancel=None, keep_partial=False):
+        """
+        Tải dữ liệu dạng luồng: mỗi sheet đọc xong được bỏ trùng và cộng dồn số đếm
+        ngay, không chờ đọc hết file; đồ thị xung đột dựng 1 lần (vector hóa, theo hồ sơ
+        tập môn) khi đã đọc xong
+        - Yields sự kiện:
+          {'type': 'sheet', file, sheet, subject, rows, kept, reason, new_pairs,
+           records, students, subjects, elapsed} - số đếm cộng dồn tới sheet hiện tại
+          {'type': 'file', ...thống kê file như stats['files']}
+          {'type': 'done', success, message, stats} - luôn là sự kiện cuối
+        - cancel: threading.Event được kiểm tra sau mỗi sheet; keep_partial=True thì
+          vẫn dựng dữ liệu từ các sheet đã đọc. Đóng generator trước 'done' cũng là hủy;
+          khi hủy (không giữ phần đã đọc) dữ liệu hiện tại của backend không đổi
+        """
+        import pandas as pd
+        import time
+        
+        t0 = time.perf_counter()
+        filepaths = list(filepaths)
+        executor = None
+        
+        def replay(items, error):
+            if error:
+                raise IOError(error)
+            yield from items
+        
+        try:
+            if workers == 1 or len(filepaths) <= 1:
+                sources = ((path, _iter_workbook_sheets(path)) for path in filepaths)
+            else:
+                # Tiến trình con đọc các file sau trong lúc file trước đang được gộp
+                executor = ProcessPoolExecutor(max_workers=workers)
+                results = executor.map(_read_workbook_sheets, filepaths)
+                sources = ((path, replay(*result)) for path, result in zip(filepaths, results))
+            
+            seen = set()                          # khóa băm của các file trước
+            subjects = set()                      # tên môn đã gặp
+            students = set()                      # MSSV đã gặp
+            kept, file_stats, sheet_stats = [], [], []
+            total_sheets = 0
+            records = 0
+            cancelled = False
+            
+            for path, sheets in sources:
+                info = {
+                    'file': os.path.basename(path),
+                    'sheets': 0,
+                    'rows': 0,
+                    'new_pairs': 0,
+                    'duplicates_in_file': 0,
+                    'duplicates_across_files': 0,
+                    'students': 0,
+                    'subjects': 0,
+                    'error': None
+                }
+                file_stats.append(info)
+                file_seen = set()
+                file_students, file_subjects = [], set()
+                
+                try:
+                    for sheet_info, frame in sheets:
+                        sheet_stats.append(sheet_info)
+                        info['sheets'] += 1
+                        total_sheets += 1
+                        new_pairs = 0
+                        
+                        if frame is not None and len(frame):
+                            # Băm (MSSV, môn) thay vì so chuỗi
+                            mssv = frame['MaSV'].astype(str).to_numpy()
+                            keys = pd.util.hash_pandas_object(
+                                pd.DataFrame({'MaSV': mssv,
+                                              'ChuongTrinh': frame['ChuongTrinh'].to_numpy()}),
+                                index=False).to_numpy()
+                            
+                            # Lần xuất hiện đầu tiên, loại cặp đã có trong file / ở file trước
+                            unique_keys, first = np.unique(keys, return_index=True)
+                            unique_keys = unique_keys.tolist()
+                            in_file = np.fromiter((k in file_seen for k in unique_keys),
+                                                  dtype=bool, count=len(unique_keys))
+                            earlier = ~in_file & np.fromiter((k in seen for k in unique_keys),
+                                                             dtype=bool, count=len(unique_keys))
+                            rows = np.sort(first[~in_file & ~earlier])
+                            file_seen.update(unique_keys)
+                            
+                            info['rows'] += len(frame)
+                            info['duplicates_in_file'] += len(keys) - len(first) + int(in_file.sum())
+                            info['duplicates_across_files'] += int(earlier.sum())
+                            file_students.append(mssv)
+                            file_subjects.add(frame['ChuongTrinh'].iat[0])
+                            
+                            if len(rows):
+                                kept.append(frame.iloc[rows])
+                                new_pairs = len(rows)
+                                subjects.add(frame['ChuongTrinh'].iat[0])
+                                students.update(mssv[rows].tolist())
+                        
+                        info['new_pairs'] += new_pairs
+                        records += new_pairs
+                        yield {
+                            'type': 'sheet',
+                            **sheet_info,
+                            'new_pairs': new_pairs,
+                            'records': records,
+                            'students': len(students),
+                            'subjects': len(subjects),
+                            'elapsed': time.perf_counter() - t0
+                        }
+                        if cancel is not None and cancel.is_set():
+                            cancelled = True
+                            break
+                except Exception as e:
+                    info['error'] = str(e)
+                
+                seen |= file_seen
+                if file_students:
+                    info['students'] = len(np.unique(np.concatenate(file_students)))
+                info['subjects'] = len(file_subjects)
+                yield {'type': 'file', **info}
+                if cancelled:
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        
+        if cancelled and not keep_partial:
+            yield {'type': 'done', 'success': False, 'message': "Đã hủy tải dữ liệu!",
+                   'stats': None}
+            return
+        if not kept:
+            yield {'type': 'done', 'success': False, 'message': "Không tìm thấy dữ liệu hợp lệ!",
+                   'stats': {'files': file_stats}}
+            return
+        
+        # Process data: kho dữ liệu dựng đồ thị từ các hồ sơ tập môn có trọng số
+        # (DataFrame gốc được giải phóng sau bước này)
+        data = pd.concat(kept, ignore_index=True)
+        self.process_data(data, sheet_stats)
+        
+        stats = {
+            'records': len(self.store.enroll_student),
+            'sheets': total_sheets,
+            'students': self.store.n_students,
+            'subjects': len(self.store.subjects),
+            'files': file_stats,
+            'quality': self.quality_report['counts'],
+            'cancelled': cancelled
+        }
+        if cancelled:
+            message = f"Đã dừng tải, giữ dữ liệu của {total_sheets} sheet đã đọc!"
+        else:
+            loaded = sum(1 for f in file_stats if f['error'] is None)
+            message = f"Tải và gộp thành công {loaded}/{len(filepaths)} file!"
+        yield {'type': 'done', 'success': True, 'message': message, 'stats': stats}
+    
+    @_writer
+    def load_dimacs_file(self, filepath):
+        """
+        Đọc đồ thị chuẩn DIMACS (.col) làm đồ thị xung đột, không có sinh viên
+        - Tên môn lấy từ dòng chú thích 'c v <i> <tên>' nếu có, ngược lại đặt V0001, V0002...
+        Returns: (success: bool, message: str, stats: dict)
+        """
+        try:
+            n = None
+            src, dst = [], []
+            names = {}
+            with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    if line.startswith('e '):
+                        _, u, v = line.split()[:3]
+                        src.append(int(u))
+                        dst.append(int(v))
+                    elif line.startswith('p '):
+                        n = int(line.split()[2])
+                    elif line.startswith('c v '):
+                        _, _, i, name = line.rstrip('\n').split(' ', 3)
+                        names[int(i)] = name
+            
+            if n is None:
+                return False, "File DIMACS thiếu dòng 'p edge'!", None
+            
+            src = np.array(src, dtype=np.int64)
+            dst = np.array(dst, dtype=np.int64)
+            bad = np.flatnonzero((src < 1) | (src > n) | (dst < 1) | (dst > n))
+            if len(bad):
+                k = int(bad[0])
+                return False, (f"Cạnh 'e {src[k]} {dst[k]}' ngoài phạm vi đỉnh 1..{n} "
+                               f"({len(bad):,} cạnh không hợp lệ)!"), None
+            
+            if len(names) == n and len(set(names.values())) == n:
+                subjects = [names[i] for i in range(1, n + 1)]
+            else:
+                width = len(str(n))
+                subjects = [f"V{i:0{width}d}" for i in range(1, n + 1)]
+            
+            self.quality_report = None
+            self.store = EnrollmentStore.from_graph(subjects, src - 1, dst - 1)
+            self.schedule = {}
+            self.strategy_timings = {}
+            self.build_timetable(solved=False)
+            
+            stats = {
+                'subjects': n,
+                'edges': self.store.n_edges
+            }
+            return True, "Tải đồ thị DIMACS thành công!", stats
+        
+        except Exception as e:
+            return False, f"Lỗi đọc file DIMACS: {str(e)}", None
+    
+    @_writer
+    def process_data(self, data, sheet_stats=None):
+        """
+        Chuyển DataFrame sang kho dạng cột và xây dựng đồ thị xung đột
+        (theo hồ sơ tập môn có trọng số, xem EnrollmentStore)
+        - sheet_stats: thống kê từng sheet lúc tải, có thì lập báo cáo chất lượng dữ liệu
+          trước khi công bố để ảnh chụp mới mang đúng báo cáo của lần tải này
+        """
+        self.store = EnrollmentStore.from_frame(data)
+        if sheet_stats is not None:
+            self.quality_report = _quality_report(data, sheet_stats, self.store)
+        
+        # Giữ lịch cũ của các môn còn tồn tại (dùng cho xếp lịch warm start)
+        index = self.store.subject_index
+        self.schedule = {s: c for s, c in self.schedule.items() if s in index}
+        self.build_timetable(solved=False)
+    
+    def _slot_array(self):
+        """Mảng ca thi theo mã môn (0 = chưa xếp)"""
+        slots = np.zeros(len(self.subjects), dtype=np.int32)
+        for subj, slot in self.schedule.items():
+            i = self.store.subject_index.get(subj)
+            if i is not None:
+                slots[i] = slot
+        return slots
+    
+    @_writer
+    def set_constraints(self, pinned=None, forbidden=None, forbidden_days=None):
+        """
+        Đặt ràng buộc xếp lịch theo tên môn (None = giữ nguyên ràng buộc cũ)
+        - pinned: {mon: ca} môn bắt buộc thi ở ca cho trước
+        - forbidden: {mon: [ca]} các ca môn không được thi
+        - forbidden_days: {mon: [ngày]} các ngày (tính từ 1) môn không được thi
+        Returns: (success: bool, message: str)
+        """
+        known = self.store.subject_index if self.store is not None else None
+        new = {
+            'pinned': self.pinned if pinned is None else
+                      {s: int(c) for s, c in pinned.items()},
+            'forbidden': self.forbidden if forbidden is None else
+                         {s: {int(c) for c in cs} for s, cs in forbidden.items() if cs},
+            'forbidden_days': self.forbidden_days if forbidden_days is None else
+                              {s: {int(d) for d in ds} for s, ds in forbidden_days.items() if ds}
+        }
+        
+        for kind in new.values():
+            for subj, value in kind.items():
+                if known is not None and subj not in known:
+                    return False, f"Không tìm thấy môn: {subj}"
+                values = value if isinstance(value, set) else {value}
+                if any(v < 1 for v in values):
+                    return False, f"Ca/ngày phải >= 1: {subj}"
+        
+        self.pinned = new['pinned']
+        self.forbidden = new['forbidden']
+        self.forbidden_days = new['forbidden_days']
+        
+        n = len(self.pinned) + len(self.forbidden) + len(self.forbidden_days)
+        return True, f"Đã đặt {n} ràng buộc"
+    
+    def _constraint_codes(self, store=None, max_exams_per_day=None):
+        """
+        Đổi ràng buộc theo tên sang mã môn; ngày cấm d được đổi thành các ca
+        (d-1)*max_exams_per_day + 1 .. d*max_exams_per_day. Bỏ qua môn không còn tồn tại.
+        - store, max_exams_per_day: mặc định theo trạng thái luồng ghi (truyền từ ảnh chụp khi đọc)
+        Returns: (pinned: {mã: ca}, forbidden: {mã: {ca}})
+        """
+        index = (store or self.store).subject_index
+        m = max_exams_per_day or self.max_exams_per_day
+        pinned = {index[s]: c for s, c in self.pinned.items() if s in index}
+        forbidden = defaultdict(set)
+        for s, cs in self.forbidden.items():
+            if s in index:
+                forbidden[index[s]].update(cs)
+        for s, ds in self.forbidden_days.items():
+            if s in index:
+                for d in ds:
+                    forbidden[index[s]].update(range((d - 1) * m + 1, d * m + 1))
+        return pinned, dict(forbidden)
+    
+    def _check_constraints(self, pinned, forbidden):
+        """Trả về thông báo lỗi nếu các ràng buộc mâu thuẫn nhau, ngược lại None"""
+        adj = self.store.adjacency()
+        for v, c in pinned.items():
+            if c in forbidden.get(v, ()):
+                return f"Môn {self.subjects[v]} cố định ở ca {c} nhưng ca này bị cấm"
+            for u in adj[v]:
+                if u > v and pinned.get(u) == c:
+                    return (f"Môn {self.subjects[v]} và {self.subjects[u]} có chung SV "
+                            f"nhưng cùng cố định ở ca {c}")
+        return None
+    
+    def _spread_allowed(self, slots, k):
+        """Ma trận allowed[lớp màu, vị trí] cho tối ưu phân bố (None nếu không có ràng buộc)"""
+        pinned, forbidden = self._constraint_codes()
+        if not pinned and not forbidden:
+            return None
+        allowed = np.ones((k, k), dtype=bool)
+        for v, c in pinned.items():
+            if slots[v]:
+                row = allowed[slots[v] - 1]
+                row[:c - 1] = False
+                row[c:] = False
+        for v, cs in forbidden.items():
+            for c in cs:
+                if slots[v] and c <= k:
+                    allowed[slots[v] - 1, c - 1] = False
+        return allowed
     
-    def load_excel_file(self, filepath):
+    def load_constraints_file(self, filepath):
         """
-        Đọc file Excel chứa danh sách lớp học phần
-        Returns: (success: bool, message: str, stats: dict)
+        Đọc ràng buộc từ file Excel/CSV: cột tên môn và các cột tùy chọn
+        'Ca cố định', 'Ca cấm', 'Ngày cấm' (nhiều giá trị cách nhau bởi dấu phẩy)
+        Returns: (success: bool, message: str)
         """
+        import pandas as pd
+        
         try:
-            all_dfs = []
-            excel = pd.ExcelFile(filepath, engine='openpyxl')
-            
-            for sheet in excel.sheet_names:
-                try:
-                    # Đọc toàn bộ sheet như string
-                    df = pd.read_excel(excel, sheet_name=sheet, header=None, 
-                                      dtype=str, engine='openpyxl')
-                    df = df.fillna('')
-                    
-                    # Tìm dòng header (chứa "Mã SV" hoặc "MSSV")
-                    header_row = None
-                    for idx in range(min(5, len(df))):
-                        row_text = ' '.join(df.iloc[idx].astype(str).str.lower().tolist())
-                        if 'mã sv' in row_text or 'mssv' in row_text or 'ma sv' in row_text:
-                            header_row = idx
-                            break
-                    
-                    if header_row is None:
-                        # Thử đọc sheet như 1 cột danh sách MSSV
-                        df2 = pd.read_excel(excel, sheet_name=sheet, dtype=str, engine='openpyxl')
-                        if df2.shape[1] >= 1:
-                            col0 = df2.columns[0]
-                            tmp = df2[[col0]].dropna()
-                            tmp.columns = ['MaSV']
-                            tmp['HoTen'] = 'N/A'
-                            tmp['ChuongTrinh'] = sheet
-                            all_dfs.append(tmp)
-                            continue
-                        else:
-                            continue
-                    
-                    # Lấy tên môn học (dòng đầu tiên hoặc tên sheet)
-                    subject_name = sheet
-                    if header_row > 0:
-                        first_cell = str(df.iloc[0, 0]).strip()
-                        if len(first_cell) > 0:
-                            subject_name = first_cell
-                    
-                    # Đặt header
-                    df.columns = df.iloc[header_row]
-                    df = df.iloc[header_row + 1:].reset_index(drop=True)
-                    
-                    # Tìm cột Mã SV và Họ Tên
-                    masv_col = None
-                    hoten_col = None
-                    
-                    for col in df.columns:
-                        col_str = str(col).lower().strip()
-                        if 'mã sv' in col_str or 'mssv' in col_str or 'ma sv' in col_str:
-                            masv_col = col
-                        if 'họ' in col_str and 'tên' in col_str:
-                            hoten_col = col
-                        elif 'tên' in col_str and hoten_col is None:
-                            hoten_col = col
-                    
-                    if masv_col is None:
-                        continue
-                    
-                    # Lọc dữ liệu
-                    if hoten_col:
-                        df_clean = df[[masv_col, hoten_col]].copy()
-                        df_clean.columns = ['MaSV', 'HoTen']
-                    else:
-                        df_clean = df[[masv_col]].copy()
-                        df_clean.columns = ['MaSV']
-                        df_clean['HoTen'] = 'N/A'
-                    
-                    df_clean['MaSV'] = df_clean['MaSV'].astype(str).str.strip()
-                    df_clean = df_clean.loc[df_clean['MaSV'].str.len() > 0].copy()
-                    mask_numeric = df_clean['MaSV'].str.match(r'^\d+$', na=False)
-                    df_clean = df_clean.loc[mask_numeric].copy()
-                    
-                    if len(df_clean) > 0:
-                        df_clean['ChuongTrinh'] = subject_name
-                        all_dfs.append(df_clean)
-                
-                except Exception as e:
-                    print(f"Lỗi đọc sheet {sheet}: {e}")
-                    continue
-            
-            if not all_dfs:
-                return False, "Không tìm thấy dữ liệu hợp lệ!", None
+            if filepath.lower().endswith('.csv'):
+                df = pd.read_csv(filepath, dtype=str)
+            else:
+                df = pd.read_excel(filepath, dtype=str, engine='openpyxl')
+            df = df.fillna('')
             
-            self.data = pd.concat(all_dfs, ignore_index=True)
-            self.data.drop_duplicates(subset=['MaSV', 'ChuongTrinh'], inplace=True)
+            columns = {}
+            for col in df.columns:
+                col_str = str(col).lower().strip()
+                if 'cố định' in col_str or 'co dinh' in col_str:
+                    columns['pinned'] = col
+                elif 'ca cấm' in col_str or 'ca cam' in col_str:
+                    columns['forbidden'] = col
+                elif 'ngày cấm' in col_str or 'ngay cam' in col_str:
+                    columns['forbidden_days'] = col
+                elif 'môn' in col_str or 'mon' in col_str or 'học phần' in col_str:
+                    columns.setdefault('subject', col)
             
-            stats = {
-                'records': len(self.data),
-                'sheets': len(excel.sheet_names),
-                'students': self.data['MaSV'].nunique(),
-                'subjects': self.data['ChuongTrinh'].nunique()
-            }
+            if 'subject' not in columns:
+                return False, "Không tìm thấy cột tên môn!"
             
-            # Process data
-            self.process_data()
+            def numbers(text):
+                return {int(x) for x in re.findall(r'\d+', text)}
             
-            return True, "Tải file thành công!", stats
+            pinned, forbidden, forbidden_days = {}, {}, {}
+            for _, row in df.iterrows():
+                subj = str(row[columns['subject']]).strip()
+                if not subj:
+                    continue
+                if 'pinned' in columns and numbers(row[columns['pinned']]):
+                    pinned[subj] = min(numbers(row[columns['pinned']]))
+                if 'forbidden' in columns:
+                    forbidden[subj] = numbers(row[columns['forbidden']])
+                if 'forbidden_days' in columns:
+                    forbidden_days[subj] = numbers(row[columns['forbidden_days']])
             
+            return self.set_constraints(pinned, forbidden, forbidden_days)
+        
         except Exception as e:
-            return False, f"Lỗi đọc file: {str(e)}", None
+            return False, f"Lỗi đọc file ràng buộc: {str(e)}"
     
-    def process_data(self):
-        """Xử lý dữ liệu và xây dựng đồ thị xung đột"""
-        self.subjects = sorted(self.data['ChuongTrinh'].unique().tolist())
-        self.student_subjects.clear()
-        self.subject_students.clear()
-        self.conflict_graph.clear()
-        
-        # Build mappings
-        for _, row in self.data.iterrows():
-            sid = str(row['MaSV']).strip()
-            subj = row['ChuongTrinh']
-            self.student_subjects[sid].add(subj)
-            self.subject_students[subj].add(sid)
-        
-        # Xây đồ thị xung đột
-        for subs in self.student_subjects.values():
-            subs = list(subs)
-            for i in range(len(subs)):
-                for j in range(i+1, len(subs)):
-                    a = subs[i]
-                    b = subs[j]
-                    self.conflict_graph[a].add(b)
-                    self.conflict_graph[b].add(a)
-    
-    def run_dsatur(self, max_exams_per_day=3, start_date=None):
+    @_writer
+    def run_dsatur(self, max_exams_per_day=3, start_date=None, warm_start=False,
+                   pinned=None, forbidden=None, forbidden_days=None, strategy='dsatur',
+                   workers=None, use_cache=True):
         """
         Chạy thuật toán DSatur để xếp lịch thi
+        - warm_start: giữ lịch hiện có, chỉ xếp lại các môn mới hoặc bị xung đột
+        - pinned / forbidden / forbidden_days: ràng buộc (xem set_constraints),
+          None = dùng ràng buộc đã đặt trước đó
+        - strategy: tên trong COLORING_STRATEGIES, hoặc 'portfolio' = chạy song song
+          mọi chiến lược trên nhiều tiến trình và giữ lịch ít ca nhất
+        - use_cache: dùng lại kết quả tô màu trong self.solve_cache nếu cùng đồ thị,
+          chiến lược và ràng buộc (đổi số ca/ngày, ngày bắt đầu chỉ dựng lại lịch theo ngày)
         Returns: (success: bool, message: str, total_slots: int, total_days: int)
         """
-        if self.data is None or len(self.subjects) == 0:
+        if self.store is None or len(self.subjects) == 0:
             return False, "Chưa tải dữ liệu!", 0, 0
+        if strategy != 'portfolio' and strategy not in COLORING_STRATEGIES:
+            return False, f"Không có chiến lược tô màu: {strategy}", 0, 0
+        
+        previous = (self.pinned, self.forbidden, self.forbidden_days, self.max_exams_per_day)
+        if pinned is not None or forbidden is not None or forbidden_days is not None:
+            success, message = self.set_constraints(pinned, forbidden, forbidden_days)
+            if not success:
+                return False, message, 0, 0
         
         self.max_exams_per_day = max_exams_per_day
+        pinned, forbidden = self._constraint_codes()
+        error = self._check_constraints(pinned, forbidden)
+        if error:
+            # Ràng buộc mâu thuẫn: khôi phục cấu hình cũ, không xếp lịch
+            (self.pinned, self.forbidden, self.forbidden_days,
+             self.max_exams_per_day) = previous
+            return False, error, 0, 0
+        
+        # So với lịch đã xếp gần nhất chứ không phải ảnh công bố: sau khi tải lại
+        # dữ liệu, ảnh công bố đã mang kho mới (mất các môn bị xóa)
+        if self._solved_snapshot is not None:
+            self.previous_snapshot = self._solved_snapshot
         if start_date:
             self.start_date = start_date
         
+        if warm_start and self.schedule:
+            return self.repair_schedule()
+        
         self.schedule.clear()
-        self.schedule_by_day.clear()
         
-        # DSatur algorithm
-        degree = {s: len(self.conflict_graph[s]) for s in self.subjects}
-        saturation = {s: 0 for s in self.subjects}
-        color_of = {}
+        # Tô màu trên mã môn số nguyên (thứ tự mã = thứ tự tên môn)
+        key = SolveCache.make_key(self.store, strategy, pinned, forbidden) if use_cache else None
+        cached = self.solve_cache.get(key) if use_cache else None
+        if cached is not None:
+            colors, best = cached
+            self.strategy_timings = {best: {'seconds': 0.0, 'slots': max(colors, default=0),
+                                            'cached': True}}
+        elif strategy == 'portfolio':
+            colors, best = self._run_portfolio(pinned, forbidden, workers)
+        else:
+            import time
+            
+            t0 = time.perf_counter()
+            colors = COLORING_STRATEGIES[strategy](self.store.adjacency(), pinned, forbidden)
+            best = strategy
+            self.strategy_timings = {strategy: {'seconds': time.perf_counter() - t0,
+                                                'slots': max(colors, default=0)}}
+        if use_cache and cached is None:
+            self.solve_cache.put(key, colors, best)
+        self.schedule = {self.subjects[s]: c for s, c in enumerate(colors)}
+        
+        # Tính toán lịch theo ngày
+        self.build_timetable()
+        
+        total_slots = max(self.schedule.values()) if self.schedule else 0
+        total_days = (total_slots + self.max_exams_per_day - 1) // self.max_exams_per_day
+        
+        message = "Xếp lịch thành công!"
+        if strategy == 'portfolio':
+            message += f" (tốt nhất: {best})"
+        if cached is not None:
+            message += " (dùng lại kết quả tô màu đã lưu)"
+        return True, message, total_slots, total_days
+    
+    def _run_portfolio(self, pinned, forbidden, workers=None):
+        """
+        Chạy mọi chiến lược trong COLORING_STRATEGIES đồng thời (workers=1: tuần tự),
+        ghi thời gian từng chiến lược vào self.strategy_timings
+        Returns: (màu theo mã môn của lịch ít ca nhất, tên chiến lược thắng)
+        """
+        store = self.store
+        names = list(COLORING_STRATEGIES)
+        args = (store.graph_indptr, store.graph_indices, pinned, forbidden)
+        if workers == 1:
+            results = [_run_coloring_strategy(name, *args) for name in names]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_run_coloring_strategy, name, *args)
+                           for name in names]
+                results = [f.result() for f in futures]
+        
+        self.strategy_timings = {name: {'seconds': seconds, 'slots': max(colors, default=0)}
+                                 for name, colors, seconds in results}
+        # Ít ca nhất, hòa thì theo thứ tự đăng ký trong COLORING_STRATEGIES
+        name, colors, _ = min(results, key=lambda r: max(r[1], default=0))
+        return colors, name
+    
+    @_writer
+    def solve(self, time_limit=10.0, on_improvement=None, max_exams_per_day=3,
+              start_date=None, strategies=('iterated_greedy', 'drop_class'), seed=0,
+              initial='dsatur'):
+        """
+        Xếp lịch kiểu anytime: trả lời nhanh bằng chiến lược tô màu initial (mặc định
+        DSatur, xem run_dsatur), sau đó cải thiện (giảm số ca)
+        bằng các chiến lược trong IMPROVEMENT_STRATEGIES cho đến khi hết time_limit giây
+        - on_improvement(event): gọi mỗi khi có lịch tốt hơn, event = {'elapsed',
+          'slots', 'days', 'strategy'}; trả về False để dừng sớm. Tại mọi thời điểm
+          self.schedule luôn là lịch hợp lệ tốt nhất đã tìm được
+        Returns: (success: bool, message: str, total_slots: int, total_days: int)
+        """
+        import random
+        import time
+        
+        unknown = [s for s in strategies if s not in IMPROVEMENT_STRATEGIES]
+        if unknown:
+            return False, f"Không có chiến lược: {', '.join(unknown)}", 0, 0
+        
+        t0 = time.perf_counter()
+        deadline = t0 + time_limit
+        success, message, total_slots, total_days = self.run_dsatur(max_exams_per_day,
+                                                                    start_date,
+                                                                    strategy=initial)
+        if not success:
+            return success, message, total_slots, total_days
+        
+        def emit(strategy):
+            if on_improvement is None:
+                return True
+            event = {
+                'elapsed': time.perf_counter() - t0,
+                'slots': total_slots,
+                'days': total_days,
+                'strategy': strategy
+            }
+            return on_improvement(event) is not False
         
-        # Build initial heap: (-saturation, -degree, subject)
-        heap = [(-saturation[s], -degree[s], s) for s in self.subjects]
-        heapq.heapify(heap)
-        colored = set()
+        pinned, forbidden = self._constraint_codes()
+        rng = random.Random(seed)
+        best = current = self._slot_array().tolist()
+        start_slots = total_slots
+        rounds = 0
+        running = emit(initial)
         
-        while heap:
-            _, _, subj = heapq.heappop(heap)
-            if subj in colored:
+        while running and strategies and time.perf_counter() < deadline:
+            name = strategies[rounds % len(strategies)]
+            rounds += 1
+            candidate = IMPROVEMENT_STRATEGIES[name](self.store, current, rng,
+                                                     pinned, forbidden)
+            if max(candidate) > max(current):
                 continue
-            
-            # Choose smallest color not used by neighbors
-            used = {color_of.get(n) for n in self.conflict_graph[subj] if n in color_of}
-            c = 1
-            while c in used:
-                c += 1
-            color_of[subj] = c
-            colored.add(subj)
-            
-            # Update neighbors' saturation and push back
-            for nei in self.conflict_graph[subj]:
-                if nei not in colored:
-                    neigh_colors = {color_of.get(n) for n in self.conflict_graph[nei] 
-                                   if n in color_of}
-                    saturation[nei] = len(neigh_colors)
-                    heapq.heappush(heap, (-saturation[nei], -degree[nei], nei))
+            current = candidate
+            if max(current) < max(best):
+                best = current
+                self.schedule = {self.subjects[s]: c for s, c in enumerate(best)}
+                self.build_timetable()
+                total_slots = max(best)
+                total_days = (total_slots + self.max_exams_per_day - 1) // self.max_exams_per_day
+                running = emit(name)
         
-        self.schedule = color_of
+        message = (f"Xếp lịch thành công! ({start_slots} → {total_slots} ca sau "
+                   f"{rounds} vòng cải thiện, {time.perf_counter() - t0:.1f}s)")
+        return True, message, total_slots, total_days
+    
+    @_writer
+    def repair_schedule(self):
+        """
+        Sửa lịch cục bộ sau khi dữ liệu thay đổi: môn không bị ảnh hưởng giữ nguyên ca
+        Returns: (success: bool, message: str, total_slots: int, total_days: int)
+        """
+        if self.store is None or len(self.subjects) == 0:
+            return False, "Chưa tải dữ liệu!", 0, 0
         
-        # Tính toán lịch theo ngày
-        self.calculate_schedule_by_day()
+        pinned, forbidden = self._constraint_codes()
+        error = self._check_constraints(pinned, forbidden)
+        if error:
+            return False, error, 0, 0
+        
+        old = self._slot_array().tolist()
+        new = _repair_coloring(self.store, old, pinned, forbidden)
+        moved = sum(1 for a, b in zip(old, new) if a != b)
+        
+        self.schedule = {self.subjects[s]: c for s, c in enumerate(new)}
+        self.build_timetable()
         
-        total_slots = max(color_of.values()) if color_of else 0
+        total_slots = max(self.schedule.values()) if self.schedule else 0
         total_days = (total_slots + self.max_exams_per_day - 1) // self.max_exams_per_day
         
-        return True, "Xếp lịch thành công!", total_slots, total_days
+        return True, f"Sửa lịch thành công! ({moved} môn được xếp lại)", total_slots, total_days
     
-    def calculate_schedule_by_day(self):
-        """Tính toán lịch thi theo ngày dựa trên số ca tối đa mỗi ngày"""
-        self.schedule_by_day.clear()
+    def get_slot_loads(self):
+        """Số sinh viên dự thi trong từng ca (phần tử i = ca i + 1)"""
+        view = self._view()
+        if view.store is None or not view.schedule:
+            return []
+        slots = view.slot_of
+        loads = np.bincount(slots, weights=view.store.subject_sizes,
+                            minlength=int(slots.max()) + 1)
+        return loads[1:].astype(np.int64).tolist()
+    
+    @_writer
+    def balance_slot_loads(self, max_rounds=None):
+        """
+        Tối ưu sau tô màu: cân bằng số SV giữa các ca bằng đổi chuỗi Kempe
+        (lịch vẫn hợp lệ, số ca không tăng)
+        Returns: (success: bool, message: str, report: dict) - report chứa tải trước/sau
+        """
+        if self.store is None or not self.schedule:
+            return False, "Chưa có lịch để tối ưu!", None
         
-        for subject, slot in self.schedule.items():
-            # Tính ngày thi
-            day_index = (slot - 1) // self.max_exams_per_day
-            session_in_day = ((slot - 1) % self.max_exams_per_day) + 1
-            
+        before = self.get_slot_loads()
+        pinned, forbidden = self._constraint_codes()
+        colors, after, moves = _balance_loads(self.store.adjacency(),
+                                              self._slot_array().tolist(),
+                                              self.store.subject_sizes.tolist(),
+                                              max_rounds, pinned, forbidden)
+        
+        self.schedule = {self.subjects[s]: c for s, c in enumerate(colors) if c}
+        self.build_timetable()
+        
+        report = {
+            'before': before,
+            'after': after,
+            'moves': moves,
+            'max_before': max(before),
+            'max_after': max(after),
+            'std_before': float(np.std(before)),
+            'std_after': float(np.std(after))
+        }
+        message = (f"Cân bằng tải thành công! ({moves} lần đổi chuỗi Kempe, "
+                   f"ca đông nhất {report['max_before']:,} → {report['max_after']:,} SV)")
+        return True, message, report
+    
+    def get_spread_metrics(self):
+        """
+        Số SV có >= 2 môn thi cùng ngày và số SV thi 2 ca liền nhau trong ngày
+        Returns: dict
+        """
+        view = self._view()
+        result = {'same_day_students': 0, 'back_to_back_students': 0}
+        if view.store is None or not view.schedule:
+            return result
+        
+        # Tính trên hồ sơ tập môn, mỗi hồ sơ vi phạm cộng số SV của nó
+        store = view.store
+        sizes = store.profiles()[3]
+        profile, slots = store.profile_rows(view.slot_of)
+        day = (slots - 1) // view.max_exams_per_day
+        
+        same_profile = profile[1:] == profile[:-1]
+        same_day = same_profile & (day[1:] == day[:-1])
+        back_to_back = same_day & (slots[1:] - slots[:-1] == 1)
+        result['same_day_students'] = int(sizes[np.unique(profile[1:][same_day])].sum())
+        result['back_to_back_students'] = int(sizes[np.unique(profile[1:][back_to_back])].sum())
+        return result
+    
+    @_writer
+    def optimize_student_spread(self, time_limit=5.0, same_day_weight=1.0,
+                                consecutive_weight=2.0):
+        """
+        Hoán vị các lớp màu (ca DSatur) lên các vị trí (ngày, ca) để giảm số SV
+        thi nhiều môn trong cùng ngày / thi 2 ca liền nhau. Lịch vẫn hợp lệ, số ca giữ nguyên.
+        Returns: (success: bool, message: str, report: dict)
+        """
+        if self.store is None or not self.schedule:
+            return False, "Chưa có lịch để tối ưu!", None
+        
+        store = self.store
+        slots = self._slot_array()
+        k = int(slots.max())
+        
+        # Ma trận đồng đăng ký giữa các lớp màu từ cạnh có trọng số: vì 1 SV có
+        # tối đa 1 môn trong mỗi lớp, tổng trọng số = đúng số SV thi cả 2 lớp
+        src = np.repeat(np.arange(len(slots)), np.diff(store.graph_indptr))
+        ca = slots[src] - 1
+        cb = slots[store.graph_indices] - 1
+        valid = (ca >= 0) & (cb >= 0)
+        coenroll = np.bincount(ca[valid] * k + cb[valid],
+                               weights=store.graph_weights[valid],
+                               minlength=k * k).reshape(k, k)
+        penalty = _spread_penalty_matrix(k, self.max_exams_per_day,
+                                         same_day_weight, consecutive_weight)
+        
+        before = self.get_spread_metrics()
+        allowed = self._spread_allowed(slots, k)
+        pos, cost_before, cost_after = _optimize_spread(coenroll, penalty, time_limit,
+                                                        allowed)
+        
+        # Lớp màu c chuyển sang vị trí pos[c - 1] + 1
+        new_slot = np.concatenate([[0], pos + 1])
+        self.schedule = {self.subjects[i]: int(new_slot[c])
+                         for i, c in enumerate(slots.tolist()) if c}
+        self.build_timetable()
+        after = self.get_spread_metrics()
+        
+        report = {
+            'before': before,
+            'after': after,
+            'cost_before': cost_before,
+            'cost_after': cost_after
+        }
+        message = (f"Tối ưu phân bố thành công! SV thi nhiều môn/ngày: "
+                   f"{before['same_day_students']:,} → {after['same_day_students']:,}; "
+                   f"SV thi 2 ca liền: {before['back_to_back_students']:,} → "
+                   f"{after['back_to_back_students']:,}")
+        return True, message, report
+    
+    def build_timetable(self, solved=True):
+        """
+        Dựng thời khóa biểu từ self.schedule và công bố thành ScheduleSnapshot mới:
+        - slot_indptr/slot_subjects: ca -> danh sách mã môn (nhiều SV trước)
+        - slot_table: ca -> (ngày, ca trong ngày, nhãn ngày dd/mm/yyyy), tính 1 lần
+        - solved: False khi chỉ tải lại dữ liệu (lịch dở dang, không dùng làm mốc so sánh)
+        Người đọc thấy lịch cũ cho đến khi ảnh chụp mới được gán (1 phép gán nguyên tử)
+        """
+        slots = self._slot_array()
+        total_slots = int(slots.max()) if len(slots) else 0
+        
+        # Mỗi ngày chỉ định dạng chuỗi ngày 1 lần
+        slot_table = [(None, 0, "")]
+        for day_index in range((total_slots + self.max_exams_per_day - 1) // self.max_exams_per_day):
             exam_date = self.start_date + timedelta(days=day_index)
             date_str = exam_date.strftime("%d/%m/%Y")
-            
-            if date_str not in self.schedule_by_day:
-                self.schedule_by_day[date_str] = {}
-            
-            self.schedule_by_day[date_str][session_in_day] = {
-                'subject': subject,
-                'students': len(self.subject_students[subject]),
-                'slot': slot
+            for session_in_day in range(1, self.max_exams_per_day + 1):
+                slot_table.append((exam_date, session_in_day, date_str))
+        
+        self._published = ScheduleSnapshot(self.store, slots, slot_table,
+                                           self.max_exams_per_day, self.start_date,
+                                           self.strategy_timings, self.quality_report)
+        if solved and self.schedule:
+            self._solved_snapshot = self._published
+    
+    def subjects_in_slot(self, slot):
+        """Mảng mã môn thi trong ca slot (lịch công bố)"""
+        return self._view().subjects_in_slot(slot)
+    
+    def get_subject_neighborhood(self, subject):
+        """
+        Mạng lân cận (ego network) của 1 môn: các môn có chung SV, số SV chung
+        và ca thi của từng môn - giải thích vì sao môn không chuyển được sang ca khác
+        Returns: dict (None nếu không có môn)
+        - neighbors: [{subject, shared, students, slot, date, session}], nhiều SV chung trước
+        - blocked_slots: {ca: số SV chung với các môn đang thi ở ca đó}
+        - free_slots: các ca hiện có (khác ca hiện tại) mà môn chuyển sang được không gây
+          trùng lịch và không vi phạm ca/ngày cấm; rỗng nếu môn bị cố định ca
+        """
+        view = self._view()
+        if view.store is None:
+            return None
+        v = view.store.subject_index.get(subject)
+        if v is None:
+            return None
+        
+        store = view.store
+        lo, hi = store.graph_indptr[v], store.graph_indptr[v + 1]
+        codes = store.graph_indices[lo:hi]
+        shared = store.graph_weights[lo:hi]
+        slots = view.slot_of[codes] if len(view.slot_of) else np.zeros(len(codes), dtype=np.int32)
+        order = np.lexsort((codes, -shared))
+        
+        def describe(code, slot):
+            _, session, date_str = view.slot_table[slot] if slot < len(view.slot_table) \
+                else view.slot_table[0]
+            return {
+                'subject': store.subjects[code],
+                'students': int(store.subject_sizes[code]),
+                'slot': int(slot),
+                'date': date_str,
+                'session': session
             }
+        
+        neighbors = []
+        for i in order.tolist():
+            item = describe(int(codes[i]), int(slots[i]))
+            item['shared'] = int(shared[i])
+            neighbors.append(item)
+        
+        total_slots = len(view.slot_table) - 1
+        blocked = np.bincount(slots, weights=shared, minlength=total_slots + 1)
+        result = describe(v, int(view.slot_of[v]) if len(view.slot_of) else 0)
+        result['neighbors'] = neighbors
+        result['blocked_slots'] = {s: int(blocked[s]) for s in range(1, total_slots + 1)
+                                   if blocked[s] > 0}
+        pinned, forbidden = self._constraint_codes(store, view.max_exams_per_day)
+        if v in pinned:
+            result['free_slots'] = []
+        else:
+            excluded = forbidden.get(v, set()) | {result['slot']}
+            result['free_slots'] = [s for s in range(1, total_slots + 1)
+                                    if blocked[s] == 0 and s not in excluded]
+        return result
     
     def check_conflicts(self):
         """
         Kiểm tra vi phạm ràng buộc cứng (trùng ca thi)
         Returns: (has_conflicts: bool, conflicts: list)
         """
+        view = self._view()
         conflicts = []
+        if view.store is None:
+            return False, conflicts
         
-        for sid, subs in self.student_subjects.items():
-            cas = [self.schedule.get(s) for s in subs]
-            unique_cas = set([c for c in cas if c is not None])
-            
-            if len([c for c in cas if c is not None]) != len(unique_cas):
-                name_df = self.data.loc[self.data['MaSV'] == sid, 'HoTen']
-                name = name_df.iloc[0] if len(name_df) > 0 else "N/A"
-                conflicts.append({
-                    'mssv': sid,
-                    'name': name,
-                    'cas': list(unique_cas)
-                })
+        # Kiểm tra trên hồ sơ tập môn: (hồ sơ, ca) đã sắp, 2 dòng liền kề trùng ca
+        store = view.store
+        profile, slots = store.profile_rows(view.slot_of)
+        dup = (profile[1:] == profile[:-1]) & (slots[1:] == slots[:-1])
+        bad = np.unique(profile[1:][dup])
+        if len(bad) == 0:
+            return False, conflicts
+        
+        # Chỉ bung ra từng SV cho các hồ sơ vi phạm
+        cas_of = {}
+        for p in bad.tolist():
+            lo, hi = np.searchsorted(profile, [p, p + 1])
+            cas_of[p] = np.unique(slots[lo:hi]).tolist()
+        profile_of = store.profiles()[0]
+        for i in np.flatnonzero(np.isin(profile_of, bad)).tolist():
+            conflicts.append({
+                'mssv': str(store.student_ids[i]),
+                'name': store.student_name(i),
+                'cas': cas_of[int(profile_of[i])]
+            })
         
         return len(conflicts) > 0, conflicts
     
     def get_statistics(self):
-        """Lấy thống kê hệ thống"""
+        """
+        Lấy thống kê hệ thống kèm chỉ số chất lượng (tính vector hóa trên mảng số nguyên)
+        - Đồ thị: mật độ, phân bố bậc (min/trung bình/trung vị/p90/max)
+        - Lịch: phân bố số môn thi/SV/ngày, số cặp ca liền nhau, tải theo ca và theo ngày
+        """
+        view = self._view()
+        store = view.store
         stats = {
-            'students': len(self.student_subjects),
-            'subjects': len(self.subjects),
-            'conflicts': sum(len(v) for v in self.conflict_graph.values()) // 2,
-            'schedule_exists': len(self.schedule) > 0
+            'students': store.n_students if store is not None else 0,
+            'subjects': len(view.subjects),
+            'conflicts': store.n_edges if store is not None else 0,
+            'schedule_exists': len(view.schedule) > 0
         }
         
-        if self.schedule:
-            total_slots = max(self.schedule.values())
-            total_days = (total_slots + self.max_exams_per_day - 1) // self.max_exams_per_day
+        if store is not None and len(view.subjects):
+            n = len(view.subjects)
+            degree = np.diff(store.graph_indptr)
+            stats.update({
+                'density': 2 * store.n_edges / (n * (n - 1)) if n > 1 else 0.0,
+                'degree_min': int(degree.min()),
+                'degree_mean': float(degree.mean()),
+                'degree_median': float(np.median(degree)),
+                'degree_p90': float(np.percentile(degree, 90)),
+                'degree_max': int(degree.max())
+            })
+        
+        if view.schedule:
+            total_slots = max(view.schedule.values())
+            total_days = (total_slots + view.max_exams_per_day - 1) // view.max_exams_per_day
             stats.update({
                 'total_slots': total_slots,
                 'total_days': total_days,
-                'slots_per_day': self.max_exams_per_day
+                'slots_per_day': view.max_exams_per_day
             })
+            stats.update(self._schedule_metrics(view, total_slots, total_days))
+            if view.strategy_timings:
+                stats['strategy_timings'] = dict(view.strategy_timings)
         
         return stats
     
+    def _schedule_metrics(self, view, total_slots, total_days):
+        """Chỉ số chất lượng lịch (ảnh chụp view) từ mảng đăng ký (sv, môn) và ca theo mã môn"""
+        store = view.store
+        m = view.max_exams_per_day
+        slots = view.slot_of
+        
+        # Tải theo ca / theo ngày (số lượt SV dự thi)
+        slot_loads = np.bincount(slots, weights=store.subject_sizes,
+                                 minlength=total_slots + 1)[1:].astype(np.int64)
+        day_loads = np.bincount(np.arange(total_slots) // m, weights=slot_loads,
+                                minlength=total_days).astype(np.int64)
+        
+        # Số môn thi của mỗi (hồ sơ, ngày): đếm trên khóa hồ sơ * số ngày + ngày,
+        # mỗi hồ sơ tính bằng số SV của nó
+        sizes = store.profiles()[3]
+        profile, enroll_slot = store.profile_rows(slots)
+        day_keys, per_day = np.unique(profile * total_days + (enroll_slot - 1) // m,
+                                      return_counts=True)
+        per_day_hist = np.bincount(per_day, weights=sizes[day_keys // total_days]
+                                   )[1:].astype(np.int64)
+        
+        # Cặp ca liền nhau trong cùng ngày: (hồ sơ, ca) đã sắp, 2 dòng liên tiếp
+        # cùng hồ sơ cách nhau 1 ca và ca nhỏ hơn không phải ca cuối ngày
+        back_to_back = ((profile[1:] == profile[:-1]) &
+                        (np.diff(enroll_slot) == 1) & (enroll_slot[:-1] % m != 0))
+        b2b_profiles = profile[:-1][back_to_back]
+        
+        return {
+            'exams_per_day_hist': per_day_hist.tolist(),
+            'max_exams_per_student_day': len(per_day_hist),
+            'multi_exam_student_days': int(per_day_hist[1:].sum()),
+            'back_to_back_pairs': int(sizes[b2b_profiles].sum()),
+            'back_to_back_students': int(sizes[np.unique(b2b_profiles)].sum()),
+            'slot_loads': slot_loads.tolist(),
+            'day_loads': day_loads.tolist(),
+            'max_slot_load': int(slot_loads.max()),
+            'mean_slot_load': float(slot_loads.mean()),
+            'std_slot_load': float(slot_loads.std()),
+            'max_day_load': int(day_loads.max())
+        }
+    
     def get_schedule_by_day(self):
-        """Lấy lịch thi theo ngày (sorted)"""
+        """Lấy lịch thi theo ngày (sorted theo ngày, ca trong ngày)"""
+        view = self._view()
         result = []
-        sorted_dates = sorted(self.schedule_by_day.keys(),
-                            key=lambda x: datetime.strptime(x, "%d/%m/%Y"))
+        sizes = view.store.subject_sizes if view.store is not None else None
         
-        for date in sorted_dates:
-            sessions = self.schedule_by_day[date]
-            for session in sorted(sessions.keys()):
-                info = sessions[session]
+        for slot in range(1, len(view.slot_indptr) - 1):
+            _, session, date_str = view.slot_table[slot]
+            for code in view.subjects_in_slot(slot).tolist():
                 result.append({
-                    'date': date,
+                    'date': date_str,
                     'session': session,
-                    'subject': info['subject'],
-                    'students': info['students'],
-                    'slot': info['slot']
+                    'subject': view.subjects[code],
+                    'students': int(sizes[code]),
+                    'slot': slot
                 })
         
         return result
     
     def get_schedule_by_slot(self):
         """Lấy lịch thi theo ca"""
+        view = self._view()
         result = []
-        ca_dict = defaultdict(list)
-        
-        for subj, ca in self.schedule.items():
-            ca_dict[ca].append((subj, len(self.subject_students[subj])))
+        sizes = view.store.subject_sizes if view.store is not None else None
         
-        for ca in sorted(ca_dict.keys()):
-            for subj, count in sorted(ca_dict[ca], key=lambda x: -x[1]):
+        for slot in range(1, len(view.slot_indptr) - 1):
+            for code in view.subjects_in_slot(slot).tolist():
                 result.append({
-                    'slot': ca,
-                    'subject': subj,
-                    'students': count
+                    'slot': slot,
+                    'subject': view.subjects[code],
+                    'students': int(sizes[code])
                 })
         
         return result
     
-    def get_student_schedule(self, search_term=None):
-        """Lấy lịch thi của sinh viên"""
-        result = []
+    # Các thứ tự sắp xếp hỗ trợ cho lịch sinh viên
+    STUDENT_SORT_KEYS = ('mssv', 'name', 'date', 'subject')
+    
+    def _match_students(self, view, search_term):
+        """Mảng mã SV khớp search_term (theo MSSV hoặc họ tên), None = tất cả"""
+        if not search_term:
+            return None
+        store = view.store
+        term = search_term.lower()
+        mask = np.char.find(store.student_ids.astype(str), term) >= 0
+        if len(store.names) > 0:
+            # Lọc trên danh sách tên duy nhất rồi ánh xạ qua mã phân loại
+            name_hit = np.array([term in n.lower() for n in store.names], dtype=bool)
+            mask |= name_hit[store.name_codes]
+        return np.flatnonzero(mask)
+    
+    def _student_rows(self, view, search_term=None, subject=None, sort_by='mssv',
+                      descending=False):
+        """
+        Chỉ số đăng ký (dòng lịch sinh viên) theo bộ lọc và thứ tự yêu cầu
+        Returns: range hoặc mảng int64 - không tạo dict cho từng dòng
+        """
+        store = view.store
+        if sort_by not in self.STUDENT_SORT_KEYS:
+            raise ValueError(f"Thứ tự sắp xếp không hợp lệ: {sort_by}")
         
-        for sid, subs in self.student_subjects.items():
-            name_df = self.data.loc[self.data['MaSV'] == sid, 'HoTen']
-            name = name_df.iloc[0] if len(name_df) > 0 else "N/A"
-            
-            # Filter by search term
-            if search_term:
-                if search_term.lower() not in sid.lower() and \
-                   search_term.lower() not in name.lower():
-                    continue
-            
-            for sub in sorted(subs):
-                slot = self.schedule.get(sub, 0)
-                if slot == 0:
-                    date_str = ""
-                    session_in_day = 0
-                else:
-                    day_index = (slot - 1) // self.max_exams_per_day
-                    session_in_day = ((slot - 1) % self.max_exams_per_day) + 1
-                    exam_date = self.start_date + timedelta(days=day_index)
-                    date_str = exam_date.strftime("%d/%m/%Y")
-                
-                result.append({
-                    'mssv': sid,
-                    'name': name,
+        students = self._match_students(view, search_term)
+        if students is None:
+            rows = range(len(store.enroll_student))
+        else:
+            # Ghép các khoảng [indptr[i], indptr[i+1]) của SV được chọn
+            starts = store.student_indptr[students]
+            counts = store.student_indptr[students + 1] - starts
+            rows = np.repeat(starts - (np.cumsum(counts) - counts), counts) + \
+                np.arange(counts.sum())
+        
+        if subject is not None:
+            code = store.subject_index.get(subject, -1)
+            rows = np.asarray(rows)
+            rows = rows[store.enroll_subject[rows] == code]
+        
+        # Dữ liệu gốc đã sắp theo (MSSV, môn); các thứ tự khác dùng sort ổn định
+        if sort_by != 'mssv':
+            rows = np.asarray(rows)
+            if sort_by == 'name':
+                key = store.name_codes[store.enroll_student[rows]]
+            elif sort_by == 'subject':
+                key = store.enroll_subject[rows]
+            else:
+                key = view.slot_of[store.enroll_subject[rows]].astype(np.int64)
+                key[key == 0] = np.iinfo(np.int64).max  # môn chưa xếp ở cuối
+            rows = rows[np.argsort(key, kind='stable')]
+        
+        if descending:
+            rows = rows[::-1]
+        return rows
+    
+    def count_student_schedule(self, search_term=None, subject=None):
+        """Số dòng lịch sinh viên khớp bộ lọc (dùng cho phân trang)"""
+        view = self._view()
+        if view.store is None:
+            return 0
+        return len(self._student_rows(view, search_term, subject))
+    
+    def iter_student_schedule(self, search_term=None, subject=None, sort_by='mssv',
+                              descending=False, offset=0, limit=None, chunk_size=4096):
+        """
+        Duyệt lười lịch thi của sinh viên, mỗi lần yield 1 dòng (dict)
+        - search_term: lọc theo MSSV / họ tên; subject: lọc theo môn
+        - sort_by: 'mssv' | 'name' | 'date' | 'subject'; descending: đảo thứ tự
+        - offset, limit: phân trang theo dòng
+        """
+        view = self._view()
+        store = view.store
+        if store is None:
+            return
+        
+        rows = self._student_rows(view, search_term, subject, sort_by, descending)
+        stop = len(rows) if limit is None else min(len(rows), offset + limit)
+        
+        # Sinh dòng theo từng khối, bộ nhớ không tăng theo tổng số đăng ký
+        for begin in range(offset, stop, chunk_size):
+            chunk = np.asarray(rows[begin:min(begin + chunk_size, stop)])
+            stu = store.enroll_student[chunk].tolist()
+            subj = store.enroll_subject[chunk].tolist()
+            for i, code in zip(stu, subj):
+                slot = int(view.slot_of[code])
+                _, session_in_day, date_str = view.slot_table[slot]
+                yield {
+                    'mssv': str(store.student_ids[i]),
+                    'name': store.student_name(i),
                     'date': date_str,
                     'session': session_in_day,
-                    'subject': sub,
+                    'subject': store.subjects[code],
                     'slot': slot
-                })
-        
-        return result
+                }
     
-    def export_to_excel(self, filepath):
-        """Xuất lịch thi ra file Excel"""
-        if not self.schedule:
+    def get_student_schedule(self, search_term=None):
+        """Lấy lịch thi của sinh viên (toàn bộ, dạng list)"""
+        return list(self.iter_student_schedule(search_term=search_term))
+    
+    def export_to_excel(self, filepath, rows_per_sheet=None, workers=None):
+        """
+        Xuất lịch thi ra file Excel (mọi sheet đọc từ cùng 1 ảnh chụp lịch)
+        - Lịch sinh viên dài hơn rows_per_sheet dòng (mặc định: giới hạn dòng của Excel)
+          được chia theo khoảng MSSV thành các sheet Lich_SinhVien, Lich_SinhVien_2, ...
+        - filepath .zip: mỗi phần là 1 file Excel riêng, tạo song song trên nhiều tiến trình
+          (workers=1: tuần tự) rồi đóng gói cùng file tổng hợp và manifest.json
+        Returns: (success: bool, message: str)
+        """
+        with self.read_view() as view:
+            return self._export_excel(view, filepath, rows_per_sheet, workers)
+    
+    @staticmethod
+    def _slot_info(view):
+        """(nhãn ngày, ca trong ngày, ca toàn bộ, ngày yyyymmdd) theo mã môn"""
+        slot_info = []
+        for slot in view.slot_of.tolist():
+            exam_date, session, date_str = view.slot_table[slot]
+            day = exam_date.strftime("%Y%m%d") if exam_date else ""
+            slot_info.append((date_str, session, slot, day))
+        return slot_info
+    
+    @staticmethod
+    def _student_shards(store, rows_per_sheet):
+        """
+        Chia SV (đã sắp theo MSSV) thành các khoảng [đầu, cuối) có tối đa rows_per_sheet
+        dòng lịch, không cắt ngang lịch của 1 SV (trừ khi 1 SV có nhiều dòng hơn giới hạn)
+        """
+        indptr = store.student_indptr
+        bounds = [0]
+        while bounds[-1] < store.n_students:
+            start = bounds[-1]
+            stop = int(np.searchsorted(indptr, indptr[start] + rows_per_sheet, 'right')) - 1
+            bounds.append(min(max(stop, start + 1), store.n_students))
+        return list(zip(bounds[:-1], bounds[1:])) or [(0, 0)]
+    
+    def _export_excel(self, view, filepath, rows_per_sheet=None, workers=None):
+        if not view.schedule:
             return False, "Chưa có lịch để xuất!"
         
+        import pandas as pd
+        
         try:
             # Lịch theo ngày
             day_rows = []
@@ -377,18 +2657,42 @@ class ExamSchedulerBackend:
                 })
             df_ca = pd.DataFrame(ca_rows)
             
-            # Lịch sinh viên
-            stu_rows = []
-            for item in self.get_student_schedule():
-                stu_rows.append({
-                    'MSSV': item['mssv'],
-                    'Họ Tên': item['name'],
-                    'Môn': item['subject'],
-                    'Ngày Thi': item['date'],
-                    'Ca trong ngày': f"Ca {item['session']}" if item['session'] > 0 else "",
-                    'Ca toàn bộ': f"Ca {item['slot']}" if item['slot'] > 0 else ""
+            # Lịch sinh viên: chia phần theo khoảng MSSV để không vượt giới hạn dòng
+            store = view.store
+            rows_per_sheet = rows_per_sheet or EXCEL_MAX_ROWS - 1
+            to_zip = filepath.lower().endswith('.zip')
+            stem = os.path.splitext(os.path.basename(filepath))[0]
+            shards = self._student_shards(store, rows_per_sheet)
+            
+            def shard_name(k):
+                if to_zip:
+                    return f"{stem}_SinhVien_{k + 1:03d}.xlsx"
+                return 'Lich_SinhVien' if k == 0 else f'Lich_SinhVien_{k + 1}'
+            
+            def shard_tasks():
+                for k, (start, stop) in enumerate(shards):
+                    lo, hi = store.student_indptr[start], store.student_indptr[stop]
+                    yield (shard_name(k),
+                           store.student_ids[start:stop].astype(str).tolist(),
+                           [store.student_name(i) for i in range(start, stop)],
+                           (store.student_indptr[start:stop + 1] - lo).tolist(),
+                           store.enroll_subject[lo:hi].tolist())
+            
+            manifest = []
+            for k, (start, stop) in enumerate(shards):
+                manifest.append({
+                    'part': k + 1,
+                    'name': shard_name(k),
+                    'rows': int(store.student_indptr[stop] - store.student_indptr[start]),
+                    'students': stop - start,
+                    'first_mssv': str(store.student_ids[start]) if stop > start else "",
+                    'last_mssv': str(store.student_ids[stop - 1]) if stop > start else ""
                 })
-            df_stu = pd.DataFrame(stu_rows)
+            df_manifest = pd.DataFrame.from_records(
+                [(m['part'], m['name'], m['rows'], m['students'], m['first_mssv'], m['last_mssv'])
+                 for m in manifest],
+                columns=['Phần', 'Sheet / File', 'Số dòng', 'Số SV', 'MSSV đầu', 'MSSV cuối'])
+            shared = {'subjects': list(view.subjects), 'slot_info': self._slot_info(view)}
             
             # Thống kê
             stats = self.get_statistics()
@@ -396,40 +2700,561 @@ class ExamSchedulerBackend:
                 'Tổng sinh viên': [stats['students']],
                 'Tổng môn': [stats['subjects']],
                 'Tổng ca (toàn bộ)': [stats.get('total_slots', 0)],
-                'Số ca/ngày (cấu hình)': [self.max_exams_per_day],
-                'Ngày bắt đầu': [self.start_date.strftime("%d/%m/%Y")]
+                'Số ca/ngày (cấu hình)': [view.max_exams_per_day],
+                'Ngày bắt đầu': [view.start_date.strftime("%d/%m/%Y")],
+                'Mật độ đồ thị': [round(stats['density'], 4)],
+                'Bậc TB': [round(stats['degree_mean'], 2)],
+                'Bậc max': [stats['degree_max']],
+                'Số môn/SV/ngày (1, 2, ...)': [', '.join(map(str, stats['exams_per_day_hist']))],
+                'Lượt SV thi ≥2 môn/ngày': [stats['multi_exam_student_days']],
+                'Cặp ca liền nhau': [stats['back_to_back_pairs']],
+                'SV thi 2 ca liền': [stats['back_to_back_students']],
+                'Tải ca max': [stats['max_slot_load']],
+                'Độ lệch chuẩn tải ca': [round(stats['std_slot_load'], 2)],
+                'Tải ngày max': [stats['max_day_load']]
             }
             df_sum = pd.DataFrame(summary)
             
-            # Ghi ra Excel
-            with pd.ExcelWriter(filepath, engine='openpyxl') as writer:
-                df_day.to_excel(writer, sheet_name='Lich_Theo_Ngay', index=False)
-                df_ca.to_excel(writer, sheet_name='Lich_Theo_Ca', index=False)
-                df_stu.to_excel(writer, sheet_name='Lich_SinhVien', index=False)
-                df_sum.to_excel(writer, sheet_name='ThongTin_TomTat', index=False)
+            # Tải theo ngày (số lượt SV dự thi)
+            df_load = pd.DataFrame({
+                'Ngày': [view.slot_table[d * view.max_exams_per_day + 1][2]
+                         for d in range(stats['total_days'])],
+                'Số lượt SV': stats['day_loads']
+            })
+            
+            # Báo cáo chất lượng dữ liệu lúc tải (nếu có bất thường)
+            quality_rows = []
+            report = view.quality_report or {}
+            for item in report.get('name_conflicts', []):
+                quality_rows.append(('MSSV nhiều họ tên', item['mssv'], ' | '.join(item['names'])))
+            for item in report.get('dropped_rows', []):
+                quality_rows.append(('Dòng bị loại', f"{item['file']} / {item['sheet']}",
+                                     f"{item['dropped']}/{item['rows']} dòng"))
+            for item in report.get('skipped_sheets', []):
+                quality_rows.append(('Sheet bị bỏ qua', f"{item['file']} / {item['sheet']}",
+                                     item['reason']))
+            for item in report.get('subject_collisions', []):
+                quality_rows.append(('Tên môn trùng nhiều sheet', item['subject'],
+                                     f"{item['file']}: {', '.join(item['sheets'])}"))
+            for group in report.get('similar_subjects', []):
+                quality_rows.append(('Tên môn gần giống', group[0], ' | '.join(group)))
+            for group in report.get('duplicate_rosters', []):
+                quality_rows.append(('Môn trùng danh sách SV', group[0], ' | '.join(group)))
+            df_quality = pd.DataFrame(quality_rows, columns=['Loại', 'Đối tượng', 'Chi tiết'])
             
+            def write_workbook(target):
+                with pd.ExcelWriter(target, engine='openpyxl') as writer:
+                    df_day.to_excel(writer, sheet_name='Lich_Theo_Ngay', index=False)
+                    df_ca.to_excel(writer, sheet_name='Lich_Theo_Ca', index=False)
+                    if not to_zip:
+                        for task in shard_tasks():
+                            _student_sheet_frame(shared, task).to_excel(
+                                writer, sheet_name=task[0], index=False)
+                    df_sum.to_excel(writer, sheet_name='ThongTin_TomTat', index=False)
+                    df_load.to_excel(writer, sheet_name='Tai_Theo_Ngay', index=False)
+                    if quality_rows:
+                        df_quality.to_excel(writer, sheet_name='ChatLuong_DuLieu', index=False)
+                    if to_zip or len(shards) > 1:
+                        df_manifest.to_excel(writer, sheet_name='DanhMuc_PhanDoan', index=False)
+            
+            # Ghi ra Excel: 1 file nhiều sheet, hoặc zip gồm file tổng hợp + các file phần
+            if not to_zip:
+                write_workbook(filepath)
+            else:
+                with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_STORED) as zf:
+                    buf = io.BytesIO()
+                    write_workbook(buf)
+                    zf.writestr(f"{stem}.xlsx", buf.getvalue())
+                    
+                    workers = _resolve_workers(workers)
+                    if workers == 1 or len(shards) == 1:
+                        results = map(functools.partial(_render_excel_shard, shared),
+                                      shard_tasks())
+                        executor = None
+                    else:
+                        executor = ProcessPoolExecutor(max_workers=workers,
+                                                       initializer=_init_bundle_worker,
+                                                       initargs=(shared,))
+                        results = _bounded_map(executor,
+                                               functools.partial(_with_bundle_shared,
+                                                                 _render_excel_shard),
+                                               shard_tasks(), window=2 * workers)
+                    try:
+                        for name, data in results:
+                            zf.writestr(name, data)
+                    finally:
+                        if executor is not None:
+                            executor.shutdown(cancel_futures=True)
+                    
+                    zf.writestr('manifest.json', json.dumps({
+                        'workbook': f"{stem}.xlsx",
+                        'rows_per_sheet': rows_per_sheet,
+                        'total_rows': len(store.enroll_student),
+                        'shards': manifest
+                    }, ensure_ascii=False, indent=2))
+            
+            if len(shards) > 1 or to_zip:
+                return True, f"Xuất file thành công! (lịch sinh viên chia thành {len(shards)} phần)"
             return True, "Xuất file thành công!"
             
         except Exception as e:
             return False, f"Lỗi xuất file: {str(e)}"
     
+    def _bundle_tasks(self, view, group_by, shard_size):
+        """Chia sinh viên (hoặc lớp học phần) thành các phân đoạn để xuất song song"""
+        store = view.store
+        if group_by == 'student':
+            for start in range(0, store.n_students, shard_size):
+                stop = min(start + shard_size, store.n_students)
+                lo, hi = store.student_indptr[start], store.student_indptr[stop]
+                yield ('student',
+                       store.student_ids[start:stop].astype(str).tolist(),
+                       [store.student_name(i) for i in range(start, stop)],
+                       (store.student_indptr[start:stop + 1] - lo).tolist(),
+                       store.enroll_subject[lo:hi].tolist())
+        else:
+            codes, members, size = [], [], 0
+            for c in range(len(store.subjects)):
+                who = store.subject_students[store.subject_indptr[c]:store.subject_indptr[c + 1]]
+                codes.append(c)
+                members.append([(str(store.student_ids[i]), store.student_name(i))
+                                for i in who.tolist()])
+                size += len(who)
+                if size >= shard_size:
+                    yield ('class', codes, members)
+                    codes, members, size = [], [], 0
+            if codes:
+                yield ('class', codes, members)
+    
+    def export_student_bundle(self, filepath, fmt='csv', group_by='student',
+                              workers=None, shard_size=2000):
+        """
+        Xuất lịch thi riêng cho từng sinh viên (hoặc từng lớp học phần) vào 1 file zip
+        - fmt: 'csv' | 'ics'; group_by: 'student' | 'class'
+        - Các phân đoạn được tạo song song trên nhiều tiến trình và ghi dần vào zip
+        Returns: (success: bool, message: str)
+        """
+        view = self._view()
+        if not view.schedule:
+            return False, "Chưa có lịch để xuất!"
+        if fmt not in ('csv', 'ics') or group_by not in ('student', 'class'):
+            return False, "Định dạng xuất không hợp lệ!"
+        
+        try:
+            shared = {
+                'fmt': fmt,
+                'subjects': list(view.subjects),
+                'slot_info': self._slot_info(view),
+                'stamp': datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+                'uid_keys': _ics_subject_keys(view.subjects) if fmt == 'ics' else None
+            }
+            tasks = self._bundle_tasks(view, group_by, shard_size)
+            
+            workers = _resolve_workers(workers)
+            
+            count = 0
+            with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
+                if workers == 1:
+                    results = map(functools.partial(_render_bundle_shard, shared), tasks)
+                    executor = None
+                else:
+                    executor = ProcessPoolExecutor(max_workers=workers,
+                                                   initializer=_init_bundle_worker,
+                                                   initargs=(shared,))
+                    results = _bounded_map(executor,
+                                           functools.partial(_with_bundle_shared,
+                                                             _render_bundle_shard),
+                                           tasks, window=2 * workers)
+                try:
+                    for files in results:
+                        for name, data in files:
+                            zf.writestr(name, data)
+                        count += len(files)
+                finally:
+                    if executor is not None:
+                        executor.shutdown(cancel_futures=True)
+            
+            return True, f"Xuất thành công {count:,} file!"
+        
+        except Exception as e:
+            return False, f"Lỗi xuất file: {str(e)}"
+    
+    def save_snapshot(self, filepath):
+        """
+        Lưu phiên làm việc (dữ liệu, đồ thị CSR, lịch thi) ra 1 file nhị phân
+        Returns: (success: bool, message: str)
+        """
+        view = self._view()
+        if view.store is None:
+            return False, "Chưa tải dữ liệu!"
+        
+        try:
+            # Ghi đè chính file đang mở: chép các kho đang map file này vào RAM trước
+            target = os.path.normcase(os.path.abspath(filepath))
+            for store in self._mapped_stores(view):
+                if getattr(store, '_mmap_path', None) == target:
+                    store.detach()
+            
+            arrays = view.store.to_arrays()
+            arrays['slot_of'] = view.slot_of
+            
+            # Tính vị trí (tương đối so với vùng dữ liệu) của từng mảng
+            entries = {}
+            offset = 0
+            for name, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                arrays[name] = arr
+                entries[name] = {'dtype': arr.dtype.str, 'shape': list(arr.shape),
+                                 'offset': offset}
+                offset += -(-arr.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+            
+            header = json.dumps({
+                'version': SNAPSHOT_VERSION,
+                'max_exams_per_day': view.max_exams_per_day,
+                'start_date': view.start_date.isoformat(),
+                'arrays': entries
+            }).encode('utf-8')
+            data_start = len(SNAPSHOT_MAGIC) + 8 + len(header)
+            data_start = -(-data_start // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+            
+            # Ghi ra file tạm cùng thư mục rồi thay thế nguyên tử: file cũ có thể
+            # đang được memory-map bởi phiên hiện tại, cắt cụt nó sẽ gây SIGBUS
+            tmp_path = f"{filepath}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    f.write(SNAPSHOT_MAGIC)
+                    f.write(len(header).to_bytes(8, 'little'))
+                    f.write(header)
+                    for name, arr in arrays.items():
+                        f.seek(data_start + entries[name]['offset'])
+                        f.write(arr.tobytes())
+                    f.truncate(data_start + offset)
+                os.replace(tmp_path, filepath)
+            except PermissionError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return False, "File phiên đang được sử dụng, hãy lưu sang file khác!"
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            
+            return True, "Lưu phiên thành công!"
+        
+        except Exception as e:
+            return False, f"Lỗi lưu phiên: {str(e)}"
+    
+    def _mapped_stores(self, view):
+        """Các kho dữ liệu backend đang giữ (kho hiện tại, lịch công bố, lịch để so sánh)"""
+        stores = {}
+        for snap in (view, self._published, self.previous_snapshot, self._solved_snapshot):
+            if snap is not None and snap.store is not None:
+                stores[id(snap.store)] = snap.store
+        if self.store is not None:
+            stores[id(self.store)] = self.store
+        return list(stores.values())
+    
+    @_writer
+    def load_snapshot(self, filepath):
+        """
+        Mở phiên đã lưu bằng memory-map: các mảng là view trên file,
+        chỉ đọc từ đĩa khi được truy cập
+        Returns: (success: bool, message: str, stats: dict)
+        """
+        mm = None
+        arrays = {}
+        try:
+            with open(filepath, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            
+            if mm[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+                mm.close()
+                return False, "File không phải snapshot lịch thi!", None
+            
+            pos = len(SNAPSHOT_MAGIC)
+            header_len = int.from_bytes(mm[pos:pos + 8], 'little')
+            header = json.loads(mm[pos + 8:pos + 8 + header_len].decode('utf-8'))
+            if header.get('version') != SNAPSHOT_VERSION:
+                mm.close()
+                return False, (f"Phiên bản snapshot không được hỗ trợ "
+                               f"({header.get('version')}, cần {SNAPSHOT_VERSION})!"), None
+            data_start = -(-(pos + 8 + header_len) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+            
+            arrays = {}
+            for name, entry in header['arrays'].items():
+                dtype = np.dtype(entry['dtype'])
+                count = int(np.prod(entry['shape']))
+                arrays[name] = np.frombuffer(mm, dtype=dtype, count=count,
+                                             offset=data_start + entry['offset'])
+            
+            store = EnrollmentStore.from_arrays(arrays)
+            store._mmap = mm  # giữ mmap sống cùng kho dữ liệu
+            store._mmap_path = os.path.normcase(os.path.abspath(filepath))
+            mm = None  # từ đây mmap thuộc về kho dữ liệu
+            
+            self.store = store
+            self.quality_report = None
+            self.strategy_timings = {}
+            self.max_exams_per_day = header['max_exams_per_day']
+            self.start_date = datetime.fromisoformat(header['start_date'])
+            slots = arrays['slot_of']
+            self.schedule = {store.subjects[i]: int(slots[i])
+                             for i in np.flatnonzero(slots).tolist()}
+            self.build_timetable()
+            
+            stats = {
+                'records': len(store.enroll_student),
+                'students': store.n_students,
+                'subjects': len(store.subjects),
+                'scheduled': len(self.schedule) > 0
+            }
+            return True, "Mở phiên thành công!", stats
+        
+        except Exception as e:
+            if mm is not None:
+                # Header hỏng hoặc file bị cắt cụt: bỏ các view rồi đóng mmap
+                arrays.clear()
+                try:
+                    mm.close()
+                except BufferError:
+                    pass
+            return False, f"Lỗi mở phiên: {str(e)}", None
+    
+    def snapshot_schedule(self):
+        """Lịch hiện hành dạng ScheduleSnapshot bất biến (None nếu chưa có dữ liệu)"""
+        view = self._view()
+        return view if view.store is not None else None
+    
+    @classmethod
+    def read_schedule_snapshot(cls, filepath):
+        """
+        Đọc lịch từ file phiên (.esnap) mà không thay đổi phiên đang mở
+        Returns: (success: bool, message: str, snapshot: ScheduleSnapshot)
+        """
+        other = cls()
+        success, message, _ = other.load_snapshot(filepath)
+        if not success:
+            return False, message, None
+        return True, message, other.snapshot_schedule()
+    
+    def diff_schedules(self, old, new=None):
+        """
+        So sánh 2 lịch (new = lịch hiện tại nếu None), ghép môn theo tên
+        - Môn "đổi lịch" khi ngày hoặc ca trong ngày thay đổi (không so số ca DSatur)
+        Returns: dict {moved, added, removed: [{subject, old_slot, old_date, old_session,
+                 new_slot, new_date, new_session, students}], unchanged, affected_students}
+        """
+        new = new or self.snapshot_schedule()
+        if old is None or new is None:
+            return None
+        
+        old_index = old.store.subject_index
+        changes = {'moved': [], 'added': [], 'removed': []}
+        unchanged = 0
+        
+        def change(subject, before, after, students):
+            return {
+                'subject': subject,
+                'old_slot': before[0], 'old_date': before[1], 'old_session': before[2],
+                'new_slot': after[0], 'new_date': after[1], 'new_session': after[2],
+                'students': students
+            }
+        
+        none = (0, '', 0)
+        for j, subject in enumerate(new.subjects):
+            after = new.slot_label(j)
+            i = old_index.get(subject)
+            if i is None:
+                changes['added'].append(change(subject, none, after,
+                                               int(new.store.subject_sizes[j])))
+                continue
+            before = old.slot_label(i)
+            if before[1:] == after[1:]:
+                unchanged += 1
+            else:
+                changes['moved'].append(change(subject, before, after,
+                                               int(new.store.subject_sizes[j])))
+        
+        new_index = new.store.subject_index
+        for i, subject in enumerate(old.subjects):
+            if subject not in new_index:
+                changes['removed'].append(change(subject, old.slot_label(i), none,
+                                                 int(old.store.subject_sizes[i])))
+        
+        # Số SV bị ảnh hưởng: hợp các danh sách SV (chỉ mục ngược) của môn thay đổi
+        mssv = [ids for ids, _, _ in self._diff_rosters(old, new, changes)]
+        changes['unchanged'] = unchanged
+        changes['affected_students'] = len(np.unique(np.concatenate(mssv))) if mssv else 0
+        return changes
+    
+    @staticmethod
+    def _diff_rosters(old, new, changes):
+        """Yields (MSSV, mã SV, snapshot) cho từng môn thay đổi, lấy từ CSR môn -> SV"""
+        for kind in ('moved', 'added', 'removed'):
+            snap = old if kind == 'removed' else new
+            store = snap.store
+            for item in changes[kind]:
+                c = store.subject_index[item['subject']]
+                codes = store.subject_students[store.subject_indptr[c]:store.subject_indptr[c + 1]]
+                yield store.student_ids[codes], codes, snap
+    
+    def iter_schedule_changes(self, old, new=None):
+        """
+        Danh sách thông báo đổi lịch: mỗi dòng = 1 SV x 1 môn thay đổi, sắp theo MSSV
+        Chi phí tỉ lệ với tổng số SV của các môn thay đổi (không duyệt toàn bộ đăng ký)
+        Yields: dict {mssv, name, subject, change, old_date, old_session, new_date, new_session}
+        """
+        new = new or self.snapshot_schedule()
+        diff = self.diff_schedules(old, new)
+        if diff is None:
+            return
+        
+        items = [(kind, item) for kind in ('moved', 'added', 'removed')
+                 for item in diff[kind]]
+        rosters = list(self._diff_rosters(old, new, diff))
+        if not rosters:
+            return
+        mssv = np.concatenate([ids for ids, _, _ in rosters])
+        codes = np.concatenate([c for _, c, _ in rosters])
+        which = np.repeat(np.arange(len(rosters)), [len(ids) for ids, _, _ in rosters])
+        
+        for k in np.lexsort((which, mssv)).tolist():
+            kind, item = items[which[k]]
+            store = rosters[which[k]][2].store
+            yield {
+                'mssv': str(mssv[k]),
+                'name': store.student_name(codes[k]),
+                'subject': item['subject'],
+                'change': kind,
+                'old_date': item['old_date'],
+                'old_session': item['old_session'],
+                'new_date': item['new_date'],
+                'new_session': item['new_session']
+            }
+    
+    DIFF_LABELS = {'moved': 'Đổi lịch', 'added': 'Môn mới', 'removed': 'Hủy thi'}
+    
+    def export_schedule_diff(self, filepath, old, new=None):
+        """
+        Xuất danh sách SV cần thông báo đổi lịch ra CSV (UTF-8 có BOM, mở được bằng Excel)
+        Returns: (success: bool, message: str)
+        """
+        view = self._view()
+        if old is None or view.store is None:
+            return False, "Chưa có lịch để so sánh!"
+        
+        try:
+            count = 0
+            with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['MSSV', 'Họ Tên', 'Môn', 'Thay đổi', 'Ngày cũ', 'Ca cũ',
+                                 'Ngày mới', 'Ca mới'])
+                for row in self.iter_schedule_changes(old, new or view):
+                    writer.writerow([
+                        row['mssv'], row['name'], row['subject'],
+                        self.DIFF_LABELS[row['change']],
+                        row['old_date'], f"Ca {row['old_session']}" if row['old_session'] else "",
+                        row['new_date'], f"Ca {row['new_session']}" if row['new_session'] else ""
+                    ])
+                    count += 1
+            return True, f"Xuất thành công {count:,} thông báo đổi lịch!"
+        
+        except Exception as e:
+            return False, f"Lỗi xuất file: {str(e)}"
+    
+    GRAPH_FORMATS = ('dimacs', 'edgelist', 'graphml')
+    
+    def export_graph(self, filepath, fmt='dimacs', include_coloring=True):
+        """
+        Xuất đồ thị xung đột (ghi dần từ CSR, không dựng danh sách cạnh trong bộ nhớ)
+        - 'dimacs': file .col (đỉnh đánh số từ 1), lịch kèm theo ở file .sol
+        - 'edgelist': TSV (môn a, môn b, số SV chung), lịch ở file .coloring.tsv
+        - 'graphml': thuộc tính slot/students nằm ngay trên mỗi đỉnh
+        Returns: (success: bool, message: str)
+        """
+        view = self._view()
+        if view.store is None:
+            return False, "Chưa tải dữ liệu!"
+        if fmt not in self.GRAPH_FORMATS:
+            return False, "Định dạng xuất không hợp lệ!"
+        
+        store = view.store
+        subjects = view.subjects
+        slots = view.slot_of
+        has_coloring = include_coloring and bool(view.schedule)
+        written = [filepath]
+        
+        try:
+            with open(filepath, 'w', encoding='utf-8', newline='\n') as f:
+                if fmt == 'dimacs':
+                    f.write("c Do thi xung dot lich thi (DSatur Pro)\n")
+                    for i, s in enumerate(subjects):
+                        f.write(f"c v {i + 1} {s}\n")
+                    f.write(f"p edge {len(subjects)} {store.n_edges}\n")
+                    for a, b, _ in store.iter_edges():
+                        f.writelines(f"e {x} {y}\n" for x, y in
+                                     zip((a + 1).tolist(), (b + 1).tolist()))
+                
+                elif fmt == 'edgelist':
+                    f.write("source\ttarget\tweight\n")
+                    for a, b, w in store.iter_edges():
+                        f.writelines(f"{subjects[x]}\t{subjects[y]}\t{z}\n" for x, y, z in
+                                     zip(a.tolist(), b.tolist(), w.tolist()))
+                
+                else:
+                    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                            '  <key id="label" for="node" attr.name="label" attr.type="string"/>\n'
+                            '  <key id="students" for="node" attr.name="students" attr.type="int"/>\n'
+                            '  <key id="slot" for="node" attr.name="slot" attr.type="int"/>\n'
+                            '  <key id="weight" for="edge" attr.name="weight" attr.type="int"/>\n'
+                            '  <graph id="conflicts" edgedefault="undirected">\n')
+                    sizes = store.subject_sizes.tolist()
+                    for i, s in enumerate(subjects):
+                        slot = f'<data key="slot">{slots[i]}</data>' if has_coloring else ''
+                        f.write(f'    <node id="n{i}"><data key="label">{escape(s)}</data>'
+                                f'<data key="students">{sizes[i]}</data>{slot}</node>\n')
+                    for a, b, w in store.iter_edges():
+                        f.writelines(f'    <edge source="n{x}" target="n{y}">'
+                                     f'<data key="weight">{z}</data></edge>\n' for x, y, z in
+                                     zip(a.tolist(), b.tolist(), w.tolist()))
+                    f.write('  </graph>\n</graphml>\n')
+            
+            # Lịch (tô màu) đi kèm để đối chiếu với solver bên ngoài
+            if has_coloring and fmt != 'graphml':
+                base = filepath.rsplit('.', 1)[0]
+                if fmt == 'dimacs':
+                    sol_path = base + '.sol'
+                    with open(sol_path, 'w', encoding='utf-8', newline='\n') as f:
+                        f.write(f"s col {int(slots.max())}\n")
+                        f.writelines(f"l {i + 1} {c}\n" for i, c in enumerate(slots.tolist()))
+                else:
+                    sol_path = base + '.coloring.tsv'
+                    with open(sol_path, 'w', encoding='utf-8', newline='\n') as f:
+                        f.write("subject\tslot\n")
+                        f.writelines(f"{s}\t{c}\n" for s, c in zip(subjects, slots.tolist()))
+                written.append(sol_path)
+            
+            return True, "Xuất đồ thị thành công: " + ", ".join(written)
+        
+        except Exception as e:
+            return False, f"Lỗi xuất đồ thị: {str(e)}"
+    
     def get_graph_data(self):
         """Lấy dữ liệu đồ thị để vẽ"""
+        view = self._view()
         nodes = []
         edges = []
         
-        for subject in self.subjects:
+        for subject in view.subjects:
             nodes.append({
                 'id': subject,
-                'color': self.schedule.get(subject, 0)
+                'color': view.schedule.get(subject, 0)
             })
         
-        processed = set()
-        for a, neighs in self.conflict_graph.items():
-            for b in neighs:
-                edge_key = tuple(sorted([a, b]))
-                if edge_key not in processed:
-                    edges.append({'source': a, 'target': b})
-                    processed.add(edge_key)
+        if view.store is not None:
+            for a, b, _ in view.store.iter_edges():
+                edges.extend({'source': view.subjects[x], 'target': view.subjects[y]}
+                             for x, y in zip(a.tolist(), b.tolist()))
         
         return {'nodes': nodes, 'edges': edges}
\ No newline at end of file
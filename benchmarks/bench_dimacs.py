@@ -0,0 +1,167 @@
+"""
+bench_dimacs.py - Đo tốc độ và chất lượng bộ tô màu trên đồ thị chuẩn DIMACS
+
+Đọc các file .col (hoặc thư mục chứa .col) vào backend bằng load_dimacs_file,
+chạy từng chế độ giải và so số ca với sắc số đã biết. Nếu không truyền file,
+script tự sinh bộ đồ thị Mycielski và hậu (queen) có sắc số đã biết.
+
+Chạy:  python benchmarks/bench_dimacs.py [file.col | thư mục ...] [--output bench_output.txt]
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from backend import ExamSchedulerBackend
+
+# Sắc số đã biết của một số đồ thị DIMACS thông dụng (theo tên file)
+KNOWN_CHROMATIC = {
+    'anna': 11, 'david': 11, 'homer': 13, 'huck': 11, 'jean': 10,
+    'games120': 9,
+    'miles250': 8, 'miles500': 20, 'miles750': 31, 'miles1000': 42, 'miles1500': 73,
+    'myciel3': 4, 'myciel4': 5, 'myciel5': 6, 'myciel6': 7, 'myciel7': 8,
+    'queen5_5': 5, 'queen6_6': 7, 'queen7_7': 7, 'queen8_8': 9, 'queen8_12': 12,
+    'queen9_9': 10,
+    'le450_5a': 5, 'le450_5b': 5, 'le450_15a': 15, 'le450_25a': 25,
+    'fpsol2.i.1': 65, 'mulsol.i.1': 49, 'zeroin.i.1': 49, 'inithx.i.1': 54,
+    'school1': 14, 'school1_nsh': 14,
+    'DSJC125.1': 5,
+}
+
+# Các chế độ giải được đo: tên -> hàm(backend) chạy và trả về số ca
+SOLVER_MODES = {
+    'dsatur': lambda b: b.run_dsatur(max_exams_per_day=1)[2],
+    'rlf': lambda b: b.run_dsatur(max_exams_per_day=1, strategy='rlf')[2],
+    'smallest_last': lambda b: b.run_dsatur(max_exams_per_day=1, strategy='smallest_last')[2],
+    'welsh_powell': lambda b: b.run_dsatur(max_exams_per_day=1, strategy='welsh_powell')[2],
+    'portfolio': lambda b: b.run_dsatur(max_exams_per_day=1, strategy='portfolio')[2],
+    'anytime': lambda b: b.solve(time_limit=2.0, max_exams_per_day=1)[2],
+}
+
+
+def mycielski_edges(k):
+    """Cạnh của đồ thị myciel<k> (sắc số k + 1), dựng từ K2 bằng phép Mycielski"""
+    n, edges = 2, [(0, 1)]
+    for _ in range(k - 1):
+        new = list(edges)
+        for u, v in edges:
+            new += [(u, n + v), (v, n + u)]
+        new += [(n + i, 2 * n) for i in range(n)]
+        n, edges = 2 * n + 1, new
+    return n, edges
+
+
+def queen_edges(size):
+    """Cạnh của đồ thị hậu queen<size>_<size>"""
+    cells = [(r, c) for r in range(size) for c in range(size)]
+    edges = []
+    for i, (r1, c1) in enumerate(cells):
+        for j in range(i + 1, len(cells)):
+            r2, c2 = cells[j]
+            if r1 == r2 or c1 == c2 or abs(r1 - r2) == abs(c1 - c2):
+                edges.append((i, j))
+    return len(cells), edges
+
+
+def write_dimacs(path, n, edges):
+    with open(path, 'w') as f:
+        f.write(f"p edge {n} {len(edges)}\n")
+        f.writelines(f"e {u + 1} {v + 1}\n" for u, v in edges)
+
+
+def generated_instances(folder):
+    """Sinh bộ đồ thị chuẩn mặc định vào thư mục tạm"""
+    paths = []
+    for k in range(3, 8):
+        path = os.path.join(folder, f'myciel{k}.col')
+        write_dimacs(path, *mycielski_edges(k))
+        paths.append(path)
+    for size in (5, 6, 7, 8, 9):
+        path = os.path.join(folder, f'queen{size}_{size}.col')
+        write_dimacs(path, *queen_edges(size))
+        paths.append(path)
+    return paths
+
+
+def count_violations(backend):
+    """Số cạnh có 2 đầu mút cùng ca (0 nếu tô màu hợp lệ)"""
+    slots = backend._slot_array()
+    bad = 0
+    for a, b, _ in backend.store.iter_edges():
+        bad += int(np.count_nonzero(slots[a] == slots[b]))
+    return bad
+
+
+def run(paths, modes):
+    results = []
+    for path in paths:
+        name = os.path.basename(path)
+        name = name[:-4] if name.endswith('.col') else name
+        backend = ExamSchedulerBackend()
+        ok, message, stats = backend.load_dimacs_file(path)
+        if not ok:
+            print(f"{name}: {message}")
+            continue
+        for mode in modes:
+            t0 = time.perf_counter()
+            slots = SOLVER_MODES[mode](backend)
+            elapsed = time.perf_counter() - t0
+            results.append({
+                'instance': name,
+                'vertices': stats['subjects'],
+                'edges': stats['edges'],
+                'mode': mode,
+                'known': KNOWN_CHROMATIC.get(name),
+                'slots': slots,
+                'time_ms': round(elapsed * 1000, 1),
+                'valid': count_violations(backend) == 0,
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('paths', nargs='*', help="File .col hoặc thư mục chứa .col")
+    parser.add_argument('--modes', nargs='+', default=list(SOLVER_MODES),
+                        choices=list(SOLVER_MODES))
+    parser.add_argument('--output', help="Ghi thêm kết quả (JSON lines) để theo dõi theo thời gian")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for p in args.paths:
+            paths += sorted(glob.glob(os.path.join(p, '*.col'))) if os.path.isdir(p) else [p]
+        if not paths:
+            paths = generated_instances(tmp)
+        results = run(paths, args.modes)
+
+    print(f"{'Đồ thị':<14}{'Đỉnh':>7}{'Cạnh':>9}  {'Chế độ':<14}{'χ':>5}{'Số ca':>7}"
+          f"{'Chênh':>7}{'ms':>10}  Hợp lệ")
+    for r in results:
+        known = '-' if r['known'] is None else r['known']
+        gap = '-' if r['known'] is None else r['slots'] - r['known']
+        print(f"{r['instance']:<14}{r['vertices']:>7}{r['edges']:>9}  {r['mode']:<14}"
+              f"{known:>5}{r['slots']:>7}{gap:>7}{r['time_ms']:>10}  "
+              f"{'✓' if r['valid'] else '✗'}")
+
+    if args.output:
+        stamp = datetime.now().isoformat(timespec='seconds')
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for r in results:
+                f.write(json.dumps({'bench': 'dimacs', 'time': stamp, **r},
+                                   ensure_ascii=False) + '\n')
+
+    return 0 if all(r['valid'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+bench_startup.py - Đo thời gian khởi động của các điểm vào giao diện
+
+Mỗi phép đo chạy trong một tiến trình Python mới để không bị ảnh hưởng
+bởi module đã import. Ngoài thời gian, script kiểm tra các thư viện nặng
+(pandas, networkx, matplotlib) KHÔNG bị import lúc khởi động.
+
+Chạy:  python benchmarks/bench_startup.py [--repeat 5] [--output bench_output.txt]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('pandas', 'networkx', 'matplotlib')
+
+# Đo import module; nếu có màn hình thì đo thêm thời gian dựng cửa sổ
+PROBE = r'''
+import sys, time, json
+t0 = time.perf_counter()
+import {module} as m
+t_import = time.perf_counter() - t0
+t_window = None
+try:
+    import tkinter as tk
+    root = tk.Tk()
+    app = getattr(m, {cls!r})(root)
+    root.update()
+    t_window = time.perf_counter() - t0
+    root.destroy()
+except Exception:
+    pass
+print(json.dumps({{
+    'import': t_import,
+    'window': t_window,
+    'loaded': [h for h in {heavy!r} if h in sys.modules],
+}}))
+'''
+
+ENTRY_POINTS = [
+    ('frontend', 'ExamSchedulerGUI'),
+    ('Dsaturfinal', 'ExamSchedulerPro'),
+]
+
+
+def measure(module, cls, repeat):
+    """Chạy probe `repeat` lần, trả về dict kết quả (trung vị)"""
+    imports, windows, loaded = [], [], set()
+    code = PROBE.format(module=module, cls=cls, heavy=HEAVY_MODULES)
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        imports.append(res['import'])
+        if res['window'] is not None:
+            windows.append(res['window'])
+        loaded.update(res['loaded'])
+    return {
+        'entry': module,
+        'import_ms': round(statistics.median(imports) * 1000, 1),
+        'window_ms': round(statistics.median(windows) * 1000, 1) if windows else None,
+        'heavy_loaded': sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help="Ghi thêm kết quả (JSON lines) để theo dõi theo thời gian")
+    args = parser.parse_args()
+
+    results = [measure(m, c, args.repeat) for m, c in ENTRY_POINTS]
+
+    print(f"{'Điểm vào':<14}{'Import (ms)':>14}{'Cửa sổ (ms)':>14}  Thư viện nặng đã nạp")
+    for r in results:
+        window = '-' if r['window_ms'] is None else r['window_ms']
+        print(f"{r['entry']:<14}{r['import_ms']:>14}{window:>14}  "
+              f"{', '.join(r['heavy_loaded']) or '(không)'}")
+
+    if args.output:
+        with open(args.output, 'a', encoding='utf-8') as f:
+            for r in results:
+                f.write(json.dumps({'bench': 'startup',
+                                    'time': datetime.now().isoformat(timespec='seconds'),
+                                    **r}, ensure_ascii=False) + '\n')
+
+    # Mã thoát khác 0 nếu thư viện nặng bị import lúc khởi động
+    return 1 if any(r['heavy_loaded'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
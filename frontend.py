@@ -4,19 +4,47 @@ frontend.py - Giao diện Tkinter
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from datetime import datetime
+import importlib.util
+import math
 import os
+import queue
+import threading
 
 # Import backend
-from backend import ExamSchedulerBackend
+from backend import ExamSchedulerBackend, COLORING_STRATEGIES
 
-# Cố gắng import để vẽ đồ thị
-try:
-    import networkx as nx
-    import matplotlib.pyplot as plt
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    HAS_GRAPH = True
-except Exception:
-    HAS_GRAPH = False
+# Số dòng lịch sinh viên mỗi trang
+STUDENT_PAGE_SIZE = 500
+
+# Số môn lân cận tối đa vẽ quanh môn trung tâm, bảng màu theo ca thi
+EGO_MAX_NEIGHBORS = 40
+SLOT_PALETTE = ['#4361ee', '#f72585', '#4cc9f0', '#7209b7', '#f8961e', '#43aa8b',
+                '#e63946', '#577590', '#90be6d', '#b5179e', '#f9c74f', '#277da1']
+
+# Thư viện vẽ đồ thị chỉ được import khi vẽ lần đầu (khởi động nhanh),
+# lúc khởi động chỉ kiểm tra xem đã cài đặt hay chưa
+HAS_GRAPH = all(importlib.util.find_spec(m) is not None
+                for m in ('networkx', 'matplotlib'))
+_graph_libs = None
+
+
+def load_graph_libs():
+    """
+    Import networkx + matplotlib (TkAgg) ở lần vẽ đầu tiên
+    Returns: (nx, plt, FigureCanvasTkAgg) hoặc None nếu không import được
+    """
+    global _graph_libs, HAS_GRAPH
+    if _graph_libs is None and HAS_GRAPH:
+        try:
+            import networkx as nx
+            import matplotlib
+            matplotlib.use('TkAgg')
+            import matplotlib.pyplot as plt
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            _graph_libs = (nx, plt, FigureCanvasTkAgg)
+        except Exception:
+            HAS_GRAPH = False
+    return _graph_libs
 
 
 class ExamSchedulerGUI:
@@ -88,17 +116,35 @@ class ExamSchedulerGUI:
                                     font=('Segoe UI', 11, 'bold'))
         upload_frame.pack(fill='x', padx=12, pady=8)
         
-        tk.Button(upload_frame, text="CHỌN FILE EXCEL", command=self.load_file,
-                 bg=self.colors['primary'], fg='white', 
-                 font=('Segoe UI', 10, 'bold'),
-                 relief='flat', padx=10, pady=8, 
-                 cursor='hand2').pack(pady=8)
+        self.load_button = tk.Button(upload_frame, text="CHỌN FILE EXCEL", 
+                                     command=self.load_file,
+                                     bg=self.colors['primary'], fg='white', 
+                                     font=('Segoe UI', 10, 'bold'),
+                                     relief='flat', padx=10, pady=8, 
+                                     cursor='hand2')
+        self.load_button.pack(pady=8)
+        self.load_thread = None
+        self.load_cancel = False
+        self.load_events = queue.Queue()
         
         self.file_label = tk.Label(upload_frame, text="Chưa chọn file...", 
                                    bg=self.colors['card'], fg='gray', 
                                    wraplength=320)
         self.file_label.pack(pady=4)
         
+        # Lưu / mở phiên làm việc (snapshot nhị phân)
+        session_frame = tk.Frame(upload_frame, bg=self.colors['card'])
+        session_frame.pack(pady=(0, 8))
+        open_session_button = tk.Button(session_frame, text="MỞ PHIÊN", command=self.open_session,
+                                        bg=self.colors['light'], fg=self.colors['dark'], 
+                                        font=('Segoe UI', 9, 'bold'), relief='flat', padx=8, 
+                                        cursor='hand2')
+        open_session_button.pack(side='left', padx=4)
+        tk.Button(session_frame, text="LƯU PHIÊN", command=self.save_session,
+                 bg=self.colors['light'], fg=self.colors['dark'], 
+                 font=('Segoe UI', 9, 'bold'), relief='flat', padx=8, 
+                 cursor='hand2').pack(side='left', padx=4)
+        
         # Cài đặt
         setting_frame = tk.LabelFrame(left, text="CÀI ĐẶT", 
                                      bg=self.colors['card'], 
@@ -134,12 +180,82 @@ class ExamSchedulerGUI:
         tk.Spinbox(date_frame, from_=2024, to=2035, textvariable=self.year_var, 
                   width=6, font=('Segoe UI', 9)).pack(side='left', padx=2)
         
+        # Ràng buộc: môn cố định ca, ca/ngày cấm (file Excel/CSV)
+        constraint_frame = tk.Frame(setting_frame, bg=self.colors['card'])
+        constraint_frame.pack(anchor='w', padx=8, pady=(0,6))
+        constraint_button = tk.Button(constraint_frame, text="RÀNG BUỘC...", 
+                                      command=self.load_constraints,
+                                      bg=self.colors['light'], fg=self.colors['dark'], 
+                                      font=('Segoe UI', 9, 'bold'), relief='flat', padx=8, 
+                                      cursor='hand2')
+        constraint_button.pack(side='left')
+        self.constraint_label = tk.Label(constraint_frame, text="Không có ràng buộc", 
+                                         bg=self.colors['card'], fg='gray')
+        self.constraint_label.pack(side='left', padx=6)
+        
+        # Xếp lại cục bộ từ lịch cũ sau khi sửa dữ liệu
+        self.warm_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(setting_frame, text="Giữ lịch cũ (chỉ xếp lại môn thay đổi)", 
+                      variable=self.warm_var, bg=self.colors['card'], 
+                      font=('Segoe UI', 10)).pack(anchor='w', padx=8, pady=(0,6))
+        
+        # Chiến lược tô màu ('portfolio' = chạy song song tất cả, giữ lịch ít ca nhất)
+        tk.Label(setting_frame, text="Chiến lược tô màu:", 
+                bg=self.colors['card'], 
+                font=('Segoe UI', 10)).pack(anchor='w', padx=8, pady=5)
+        self.strategy_var = tk.StringVar(value='dsatur')
+        ttk.Combobox(setting_frame, textvariable=self.strategy_var, width=16, 
+                    values=list(COLORING_STRATEGIES) + ['portfolio'], 
+                    state='readonly').pack(anchor='w', padx=8, pady=(0,6))
+        
         # Nút chạy
-        tk.Button(left, text="CHẠY DSATUR", command=self.run_dsatur,
-                 bg=self.colors['success'], fg='white', 
-                 font=('Segoe UI', 12, 'bold'),
-                 relief='flat', padx=10, pady=10, 
-                 cursor='hand2').pack(pady=18, padx=12, fill='x')
+        run_button = tk.Button(left, text="CHẠY DSATUR", command=self.run_dsatur,
+                               bg=self.colors['success'], fg='white', 
+                               font=('Segoe UI', 12, 'bold'),
+                               relief='flat', padx=10, pady=10, 
+                               cursor='hand2')
+        run_button.pack(pady=(18, 6), padx=12, fill='x')
+        
+        # Xếp lịch anytime: DSatur rồi cải thiện số ca trong thời gian cho trước
+        solve_frame = tk.Frame(left, bg=self.colors['card'])
+        solve_frame.pack(pady=(0, 6), padx=12, fill='x')
+        self.solve_time_var = tk.IntVar(value=10)
+        tk.Spinbox(solve_frame, from_=1, to=600, textvariable=self.solve_time_var, 
+                  width=5, font=('Segoe UI', 10)).pack(side='left')
+        tk.Label(solve_frame, text="giây", bg=self.colors['card'], 
+                font=('Segoe UI', 10)).pack(side='left', padx=(2, 6))
+        self.solve_button = tk.Button(solve_frame, text="GIẢM SỐ CA", 
+                                      command=self.run_solve,
+                                      bg=self.colors['light'], fg=self.colors['dark'], 
+                                      font=('Segoe UI', 10, 'bold'),
+                                      relief='flat', padx=10, pady=6, 
+                                      cursor='hand2')
+        self.solve_button.pack(side='left', fill='x', expand=True)
+        self.solve_label = tk.Label(left, text="", bg=self.colors['card'], fg='gray')
+        self.solve_label.pack(padx=12, anchor='w')
+        self.solve_thread = None
+        self.solve_stop = False
+        self.solve_events = queue.Queue()
+        
+        # Tối ưu sau xếp lịch
+        balance_button = tk.Button(left, text="CÂN BẰNG TẢI CÁC CA", command=self.balance_loads,
+                                   bg=self.colors['light'], fg=self.colors['dark'], 
+                                   font=('Segoe UI', 10, 'bold'),
+                                   relief='flat', padx=10, pady=6, 
+                                   cursor='hand2')
+        balance_button.pack(pady=(0, 6), padx=12, fill='x')
+        spread_button = tk.Button(left, text="GIẢN CÁCH NGÀY THI CỦA SV", 
+                                  command=self.optimize_spread,
+                                  bg=self.colors['light'], fg=self.colors['dark'], 
+                                  font=('Segoe UI', 10, 'bold'),
+                                  relief='flat', padx=10, pady=6, 
+                                  cursor='hand2')
+        spread_button.pack(pady=(0, 12), padx=12, fill='x')
+        
+        # Các nút ghi vào backend (chờ khóa ghi): khóa lại khi đang xếp lịch anytime
+        # để luồng Tkinter không bị treo tới hết thời gian xếp lịch
+        self.writer_buttons = [open_session_button, constraint_button, run_button,
+                               balance_button, spread_button]
         
         # Thống kê
         stats_frame = tk.LabelFrame(left, text="THỐNG KÊ", 
@@ -161,6 +277,11 @@ class ExamSchedulerGUI:
         
         notebook = ttk.Notebook(right)
         notebook.pack(fill='both', expand=True, padx=8, pady=8)
+        self.notebook = notebook
+        
+        # Đồ thị chỉ vẽ khi tab đồ thị được mở (tránh import matplotlib sớm)
+        self.graph_dirty = False
+        notebook.bind('<<NotebookTabChanged>>', self.refresh_graph_tab)
         
         # Tab 1: Lịch thi theo ngày
         self.create_tab_by_day(notebook)
@@ -174,7 +295,10 @@ class ExamSchedulerGUI:
         # Tab 4: Đồ thị
         self.create_tab_graph(notebook)
         
-        # Tab 5: Export & Kiểm tra
+        # Tab 5: Môn lân cận (vẽ nhanh trên Canvas, không cần networkx)
+        self.create_tab_neighborhood(notebook)
+        
+        # Tab 6: Export & Kiểm tra
         self.create_tab_export(notebook)
     
     def create_tab_by_day(self, notebook):
@@ -242,15 +366,30 @@ class ExamSchedulerGUI:
                 width=40, font=('Segoe UI', 10)).pack(side='left', padx=6)
         self.search_var.trace('w', self.filter_students)
         
-        # Treeview
+        # Phân trang: chỉ lấy từ backend đúng số dòng của trang hiện tại
+        self.student_page = 0
+        self.student_sort = ('mssv', False)
+        page_frame = tk.Frame(tab3, bg='white')
+        page_frame.pack(side='bottom', fill='x', padx=8, pady=(0, 6))
+        tk.Button(page_frame, text="◀ Trang trước", 
+                 command=lambda: self.show_student_page(self.student_page - 1),
+                 relief='flat', cursor='hand2').pack(side='left')
+        tk.Button(page_frame, text="Trang sau ▶", 
+                 command=lambda: self.show_student_page(self.student_page + 1),
+                 relief='flat', cursor='hand2').pack(side='left', padx=6)
+        self.page_label = tk.Label(page_frame, text="", bg='white', 
+                                   font=('Segoe UI', 9))
+        self.page_label.pack(side='left', padx=6)
+        
+        # Treeview (bấm tiêu đề cột để sắp xếp)
         self.tree_student = ttk.Treeview(tab3, 
                                         columns=('MSSV', 'Tên', 'Ngày', 'Ca', 'Môn'), 
                                         show='headings')
-        self.tree_student.heading('MSSV', text='MSSV')
-        self.tree_student.heading('Tên', text='Họ Tên')
-        self.tree_student.heading('Ngày', text='Ngày Thi')
-        self.tree_student.heading('Ca', text='Ca')
-        self.tree_student.heading('Môn', text='Môn Học')
+        for col, text, key in (('MSSV', 'MSSV', 'mssv'), ('Tên', 'Họ Tên', 'name'),
+                               ('Ngày', 'Ngày Thi', 'date'), ('Ca', 'Ca', 'date'),
+                               ('Môn', 'Môn Học', 'subject')):
+            self.tree_student.heading(col, text=text, 
+                                      command=lambda k=key: self.sort_students(k))
         
         self.tree_student.column('MSSV', width=100)
         self.tree_student.column('Tên', width=200)
@@ -270,6 +409,7 @@ class ExamSchedulerGUI:
         """Tab đồ thị xung đột"""
         tab4 = tk.Frame(notebook, bg='white')
         notebook.add(tab4, text='📊 Đồ Thị Xung Đột')
+        self.tab_graph = tab4
         
         self.graph_canvas = tk.Canvas(tab4, bg='white')
         self.graph_canvas.pack(fill='both', expand=True, padx=8, pady=8)
@@ -280,6 +420,110 @@ class ExamSchedulerGUI:
                     fg='red', 
                     font=('Segoe UI', 12)).pack(pady=50)
     
+    def create_tab_neighborhood(self, notebook):
+        """Tab mạng lân cận của 1 môn: môn xung đột, số SV chung, ca thi"""
+        tab = tk.Frame(notebook, bg='white')
+        notebook.add(tab, text='🔍 Môn Lân Cận')
+        
+        top = tk.Frame(tab, bg='white')
+        top.pack(fill='x', padx=8, pady=8)
+        tk.Label(top, text="Môn học:", bg='white', 
+                font=('Segoe UI', 10)).pack(side='left')
+        self.ego_var = tk.StringVar()
+        ego_box = ttk.Combobox(top, textvariable=self.ego_var, width=40,
+                               postcommand=lambda: ego_box.config(values=self.backend.subjects))
+        ego_box.pack(side='left', padx=6)
+        ego_box.bind('<<ComboboxSelected>>', lambda e: self.show_neighborhood())
+        ego_box.bind('<Return>', lambda e: self.show_neighborhood())
+        tk.Button(top, text="XEM", command=self.show_neighborhood,
+                 bg=self.colors['primary'], fg='white', 
+                 font=('Segoe UI', 9, 'bold'), relief='flat', padx=10, 
+                 cursor='hand2').pack(side='left')
+        
+        body = tk.Frame(tab, bg='white')
+        body.pack(fill='both', expand=True, padx=8, pady=(0, 8))
+        self.ego_info = tk.Text(body, width=34, bg=self.colors['light'], 
+                               relief='flat', font=('Consolas', 9))
+        self.ego_info.pack(side='right', fill='y', padx=(8, 0))
+        self.ego_canvas = tk.Canvas(body, bg='white', highlightthickness=0)
+        self.ego_canvas.pack(side='left', fill='both', expand=True)
+        self.ego_canvas.bind('<Configure>', lambda e: self.draw_neighborhood())
+        self.ego_data = None
+    
+    def show_neighborhood(self, subject=None):
+        """Tra cứu mạng lân cận của môn đang chọn"""
+        if subject is not None:
+            self.ego_var.set(subject)
+        data = self.backend.get_subject_neighborhood(self.ego_var.get().strip())
+        if data is None:
+            messagebox.showwarning("Cảnh báo", "Không tìm thấy môn học!")
+            return
+        self.ego_data = data
+        self.draw_neighborhood()
+        
+        info = self.ego_info
+        info.delete('1.0', tk.END)
+        slot_text = f"Ca {data['slot']} ({data['date']})" if data['slot'] else "Chưa xếp"
+        info.insert(tk.END, f"{data['subject']}\n{data['students']:,} SV • {slot_text}\n")
+        info.insert(tk.END, f"{len(data['neighbors'])} môn xung đột\n\n")
+        if data['blocked_slots']:
+            info.insert(tk.END, "SV CHUNG THEO CA:\n")
+            for slot, shared in data['blocked_slots'].items():
+                info.insert(tk.END, f"  Ca {slot:>3}: {shared:>6,} SV\n")
+            free = ', '.join(str(s) for s in data['free_slots'])
+            info.insert(tk.END, f"\nCa chuyển được: {free or 'không có'}\n")
+        if data['neighbors']:
+            info.insert(tk.END, "\nMÔN KỀ (SV chung • ca):\n")
+            for n in data['neighbors']:
+                info.insert(tk.END, f"  {n['subject'][:20]:<20} {n['shared']:>5,} • {n['slot']}\n")
+    
+    def draw_neighborhood(self):
+        """Vẽ môn trung tâm và các môn kề theo vòng tròn (độ dày cạnh ~ số SV chung)"""
+        canvas = self.ego_canvas
+        canvas.delete('all')
+        data = self.ego_data
+        if data is None:
+            return
+        
+        w, h = canvas.winfo_width(), canvas.winfo_height()
+        cx, cy = w / 2, h / 2
+        radius = max(min(w, h) / 2 - 70, 60)
+        
+        def color(slot):
+            return SLOT_PALETTE[(slot - 1) % len(SLOT_PALETTE)] if slot else 'gray'
+        
+        shown = data['neighbors'][:EGO_MAX_NEIGHBORS]
+        # Xếp các môn kề theo ca để các môn cùng ca nằm cạnh nhau
+        shown = sorted(shown, key=lambda n: (n['slot'], -n['shared']))
+        top_shared = max((n['shared'] for n in shown), default=1)
+        
+        for i, n in enumerate(shown):
+            angle = 2 * math.pi * i / len(shown)
+            x, y = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+            width = 1 + 6 * n['shared'] / top_shared
+            canvas.create_line(cx, cy, x, y, width=width, fill='#adb5bd')
+            tag = f"ego{i}"
+            canvas.create_oval(x - 9, y - 9, x + 9, y + 9, fill=color(n['slot']),
+                               outline='white', tags=(tag,))
+            anchor = 'w' if math.cos(angle) >= 0 else 'e'
+            dx = 12 if anchor == 'w' else -12
+            canvas.create_text(x + dx, y, anchor=anchor, font=('Segoe UI', 8), tags=(tag,),
+                               text=f"{n['subject']}\nCa {n['slot']} • {n['shared']} SV chung")
+            # Bấm vào môn kề để xem mạng lân cận của môn đó
+            canvas.tag_bind(tag, '<Button-1>',
+                            lambda e, s=n['subject']: self.show_neighborhood(s))
+            canvas.tag_bind(tag, '<Enter>', lambda e: canvas.config(cursor='hand2'))
+            canvas.tag_bind(tag, '<Leave>', lambda e: canvas.config(cursor=''))
+        
+        canvas.create_oval(cx - 16, cy - 16, cx + 16, cy + 16, fill=color(data['slot']),
+                           outline=self.colors['dark'], width=2)
+        canvas.create_text(cx, cy + 28, text=data['subject'], 
+                           font=('Segoe UI', 10, 'bold'))
+        hidden = len(data['neighbors']) - len(shown)
+        if hidden > 0:
+            canvas.create_text(8, h - 8, anchor='sw', fill='gray', font=('Segoe UI', 9),
+                               text=f"+{hidden} môn kề ít SV chung hơn (xem danh sách bên phải)")
+    
     def create_tab_export(self, notebook):
         """Tab export và kiểm tra"""
         tab5 = tk.Frame(notebook, bg='white')
@@ -291,6 +535,46 @@ class ExamSchedulerGUI:
                  font=('Segoe UI', 11, 'bold'), 
                  pady=8).pack(pady=16)
         
+        # Xuất hàng loạt: 1 file cho mỗi sinh viên / lớp học phần, gói trong zip
+        bundle_frame = tk.Frame(tab5, bg='white')
+        bundle_frame.pack(pady=(0, 8))
+        self.bundle_fmt_var = tk.StringVar(value='csv')
+        self.bundle_group_var = tk.StringVar(value='student')
+        ttk.Combobox(bundle_frame, textvariable=self.bundle_fmt_var, 
+                    values=('csv', 'ics'), width=6, 
+                    state='readonly').pack(side='left', padx=4)
+        ttk.Combobox(bundle_frame, textvariable=self.bundle_group_var, 
+                    values=('student', 'class'), width=9, 
+                    state='readonly').pack(side='left', padx=4)
+        tk.Button(bundle_frame, text="XUẤT LỊCH TỪNG SV (ZIP)", 
+                 command=self.export_bundle,
+                 bg=self.colors['primary'], fg='white', 
+                 font=('Segoe UI', 10, 'bold')).pack(side='left', padx=4)
+        
+        # Xuất đồ thị xung đột (kèm lịch) để đối chiếu với solver bên ngoài
+        graph_frame = tk.Frame(tab5, bg='white')
+        graph_frame.pack(pady=(0, 8))
+        self.graph_fmt_var = tk.StringVar(value='dimacs')
+        ttk.Combobox(graph_frame, textvariable=self.graph_fmt_var, 
+                    values=self.backend.GRAPH_FORMATS, width=10, 
+                    state='readonly').pack(side='left', padx=4)
+        tk.Button(graph_frame, text="XUẤT ĐỒ THỊ XUNG ĐỘT", 
+                 command=self.export_graph,
+                 bg=self.colors['dark'], fg='white', 
+                 font=('Segoe UI', 10, 'bold')).pack(side='left', padx=4)
+        
+        # So sánh với lịch trước để thông báo SV bị đổi lịch thi
+        diff_frame = tk.Frame(tab5, bg='white')
+        diff_frame.pack(pady=(0, 8))
+        tk.Button(diff_frame, text="SO VỚI LẦN CHẠY TRƯỚC", 
+                 command=lambda: self.compare_schedules(False),
+                 bg=self.colors['success'], fg='white', 
+                 font=('Segoe UI', 10, 'bold')).pack(side='left', padx=4)
+        tk.Button(diff_frame, text="SO VỚI FILE PHIÊN...", 
+                 command=lambda: self.compare_schedules(True),
+                 bg=self.colors['success'], fg='white', 
+                 font=('Segoe UI', 10, 'bold')).pack(side='left', padx=4)
+        
         self.warning_text = tk.Text(tab5, height=12, 
                                    bg='#fff5f5', fg='red', 
                                    font=('Segoe UI', 10))
@@ -299,32 +583,171 @@ class ExamSchedulerGUI:
     # === EVENT HANDLERS ===
     
     def load_file(self):
-        """Xử lý tải file Excel"""
-        filepath = filedialog.askopenfilename(
+        """Xử lý tải file Excel (chọn nhiều file để gộp dữ liệu các khoa)"""
+        if self.load_thread is not None:
+            # Đang tải: bấm lần nữa để hủy (dữ liệu cũ được giữ nguyên)
+            self.load_cancel = True
+            return
+        
+        filepaths = filedialog.askopenfilenames(
             filetypes=[("Excel files", "*.xlsx *.xls")]
         )
-        if not filepath:
+        if not filepaths:
             return
         
-        success, message, stats = self.backend.load_excel_file(filepath)
+        def on_progress(event):
+            self.load_events.put(('event', event))
+            return not self.load_cancel
+        
+        def worker():
+            if len(filepaths) == 1:
+                result = self.backend.load_excel_file(filepaths[0], on_progress=on_progress)
+            else:
+                result = self.backend.load_excel_files(filepaths, on_progress=on_progress)
+            self.load_events.put(('done', result))
+        
+        self.load_cancel = False
+        self.load_button.config(text="HỦY TẢI")
+        self.file_label.config(text="Đang đọc file...", fg='gray')
+        self.load_thread = threading.Thread(target=worker, daemon=True)
+        self.load_thread.start()
+        self.root.after(100, lambda: self.poll_load(filepaths))
+    
+    def poll_load(self, filepaths):
+        """Hiện tiến trình đọc từng sheet, xử lý kết quả khi tải xong"""
+        result = None
+        while not self.load_events.empty():
+            kind, payload = self.load_events.get()
+            if kind == 'done':
+                result = payload
+            elif payload['type'] == 'sheet':
+                self.file_label.config(
+                    text=f"Đang đọc {payload['file']} / {payload['sheet']}\n"
+                         f"{payload['records']:,} dòng • {payload['students']:,} SV • "
+                         f"{payload['subjects']} môn ({payload['elapsed']:.0f}s)"
+                )
+        
+        if result is None:
+            self.root.after(100, lambda: self.poll_load(filepaths))
+            return
+        
+        self.load_thread = None
+        self.load_button.config(text="CHỌN FILE EXCEL")
+        success, message, stats = result
+        if len(filepaths) == 1:
+            title = os.path.basename(filepaths[0])
+        else:
+            title = f"{len(filepaths)} file"
         
         if success:
             self.file_label.config(
-                text=f"ĐÃ TẢI: {os.path.basename(filepath)}\n"
+                text=f"ĐÃ TẢI: {title}\n"
                      f"{stats['records']} dòng • {stats['subjects']} môn",
                 fg='green'
             )
             
+            # Đóng góp của từng file khi gộp nhiều file
+            per_file = ""
+            if len(filepaths) > 1:
+                per_file = "\n\n" + "\n".join(
+                    f"• {f['file']}: lỗi - {f['error']}" if f['error'] else
+                    f"• {f['file']}: +{f['new_pairs']:,} mới, "
+                    f"{f['duplicates_across_files']:,} trùng file khác"
+                    for f in stats['files']
+                )
+            
+            # Cảnh báo chất lượng dữ liệu (chỉ hiện các mục có vấn đề)
+            labels = {
+                'name_conflicts': "MSSV có nhiều họ tên",
+                'dropped_rows': "dòng bị loại (MSSV không hợp lệ)",
+                'skipped_sheets': "sheet bị bỏ qua",
+                'subject_collisions': "tên môn trùng giữa nhiều sheet",
+                'similar_subjects': "nhóm tên môn gần giống nhau",
+                'duplicate_rosters': "nhóm môn có danh sách SV giống hệt"
+            }
+            warnings = [f"• {count:,} {labels[key]}"
+                        for key, count in stats['quality'].items() if count]
+            quality = "\n\nCẢNH BÁO DỮ LIỆU:\n" + "\n".join(warnings) if warnings else ""
+            
             messagebox.showinfo(
                 "Thành công",
-                f"Đã tải thành công!\n\n"
+                f"{message}\n\n"
                 f"• {stats['records']:,} bản ghi\n"
                 f"• {stats['sheets']} sheet\n"
                 f"• {stats['students']} sinh viên\n"
                 f"• {stats['subjects']} môn học"
+                f"{per_file}{quality}"
             )
             
             self.update_stats()
+        elif stats is None and self.load_cancel:
+            self.file_label.config(text=message, fg='gray')
+        else:
+            self.file_label.config(text=message, fg='red')
+            messagebox.showerror("Lỗi", message)
+    
+    def save_session(self):
+        """Lưu phiên làm việc ra file snapshot"""
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".esnap",
+            filetypes=[("Phiên xếp lịch", "*.esnap")],
+            title="Lưu phiên làm việc"
+        )
+        if not filepath:
+            return
+        
+        success, message = self.backend.save_snapshot(filepath)
+        if success:
+            messagebox.showinfo("Thành công", message)
+        else:
+            messagebox.showerror("Lỗi", message)
+    
+    def open_session(self):
+        """Mở phiên làm việc đã lưu"""
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Phiên xếp lịch", "*.esnap")]
+        )
+        if not filepath:
+            return
+        
+        success, message, stats = self.backend.load_snapshot(filepath)
+        if not success:
+            messagebox.showerror("Lỗi", message)
+            return
+        
+        self.file_label.config(
+            text=f"ĐÃ MỞ PHIÊN: {os.path.basename(filepath)}\n"
+                 f"{stats['records']} dòng • {stats['subjects']} môn",
+            fg='green'
+        )
+        self.max_var.set(self.backend.max_exams_per_day)
+        self.day_var.set(str(self.backend.start_date.day))
+        self.month_var.set(str(self.backend.start_date.month))
+        self.year_var.set(str(self.backend.start_date.year))
+        
+        if stats['scheduled']:
+            self.display_results()
+            self.check_conflicts()
+            self.graph_dirty = True
+            self.refresh_graph_tab()
+        self.update_stats()
+    
+    def load_constraints(self):
+        """Tải ràng buộc xếp lịch (ca cố định, ca cấm, ngày cấm)"""
+        filepath = filedialog.askopenfilename(
+            filetypes=[("Excel/CSV", "*.xlsx *.xls *.csv")]
+        )
+        if not filepath:
+            return
+        
+        success, message = self.backend.load_constraints_file(filepath)
+        if success:
+            self.constraint_label.config(
+                text=f"{len(self.backend.pinned)} cố định • "
+                     f"{len(self.backend.forbidden) + len(self.backend.forbidden_days)} cấm",
+                fg='green'
+            )
+            messagebox.showinfo("Thành công", message)
         else:
             messagebox.showerror("Lỗi", message)
     
@@ -346,18 +769,21 @@ class ExamSchedulerGUI:
         # Chạy backend
         success, message, total_slots, total_days = self.backend.run_dsatur(
             max_exams_per_day=max_exams,
-            start_date=start_date
+            start_date=start_date,
+            warm_start=self.warm_var.get(),
+            strategy=self.strategy_var.get()
         )
         
         if success:
             self.display_results()
             self.check_conflicts()
-            self.draw_graph()
+            self.graph_dirty = True
+            self.refresh_graph_tab()
             self.update_stats()
             
             messagebox.showinfo(
                 "HOÀN THÀNH",
-                f"Đã xếp lịch thành công!\n\n"
+                f"{message}\n\n"
                 f"• Tổng ca thi: {total_slots}\n"
                 f"• Số ca/ngày: {max_exams}\n"
                 f"• Tổng số ngày thi: {total_days}"
@@ -365,10 +791,125 @@ class ExamSchedulerGUI:
         else:
             messagebox.showwarning("Cảnh báo", message)
     
+    def run_solve(self):
+        """Xếp lịch anytime ở luồng nền; bấm lần nữa để dừng và giữ lịch tốt nhất"""
+        if self.solve_thread is not None:
+            self.solve_stop = True
+            return
+        
+        try:
+            start_date = datetime(
+                int(self.year_var.get()), 
+                int(self.month_var.get()), 
+                int(self.day_var.get())
+            )
+        except Exception:
+            messagebox.showerror("Lỗi", "Ngày tháng không hợp lệ!")
+            return
+        
+        def on_improvement(event):
+            self.solve_events.put(('event', event))
+            return not self.solve_stop
+        
+        strategy = self.strategy_var.get()
+        
+        def worker():
+            result = self.backend.solve(
+                time_limit=int(self.solve_time_var.get()),
+                on_improvement=on_improvement,
+                max_exams_per_day=int(self.max_var.get()),
+                start_date=start_date,
+                initial=strategy
+            )
+            self.solve_events.put(('done', result))
+        
+        self.solve_stop = False
+        self.solve_button.config(text="DỪNG")
+        for button in self.writer_buttons:
+            button.config(state='disabled')
+        self.solve_label.config(text="Đang xếp lịch...", fg='gray')
+        self.solve_thread = threading.Thread(target=worker, daemon=True)
+        self.solve_thread.start()
+        self.root.after(100, self.poll_solve)
+    
+    def poll_solve(self):
+        """Cập nhật tiến trình xếp lịch anytime (Tkinter chỉ được gọi từ luồng chính)"""
+        result = None
+        while not self.solve_events.empty():
+            kind, payload = self.solve_events.get()
+            if kind == 'event':
+                self.solve_label.config(
+                    text=f"{payload['elapsed']:.1f}s: {payload['slots']} ca, "
+                         f"{payload['days']} ngày ({payload['strategy']})"
+                )
+            else:
+                result = payload
+        
+        if result is None:
+            self.root.after(100, self.poll_solve)
+            return
+        
+        self.solve_thread = None
+        self.solve_button.config(text="GIẢM SỐ CA")
+        for button in self.writer_buttons:
+            button.config(state='normal')
+        success, message, total_slots, total_days = result
+        if not success:
+            self.solve_label.config(text="")
+            messagebox.showwarning("Cảnh báo", message)
+            return
+        
+        self.solve_label.config(text=f"{total_slots} ca, {total_days} ngày", fg='green')
+        self.display_results()
+        self.check_conflicts()
+        self.graph_dirty = True
+        self.refresh_graph_tab()
+        self.update_stats()
+        messagebox.showinfo("HOÀN THÀNH", message)
+    
+    def balance_loads(self):
+        """Cân bằng số sinh viên giữa các ca (đổi chuỗi Kempe)"""
+        success, message, report = self.backend.balance_slot_loads()
+        if not success:
+            messagebox.showwarning("Cảnh báo", message)
+            return
+        
+        self.display_results()
+        self.check_conflicts()
+        self.graph_dirty = True
+        self.refresh_graph_tab()
+        self.update_stats()
+        
+        messagebox.showinfo(
+            "HOÀN THÀNH",
+            f"{message}\n\n"
+            f"• Độ lệch chuẩn tải: {report['std_before']:.1f} → {report['std_after']:.1f}\n"
+            f"• Ca đông nhất: {report['max_before']:,} → {report['max_after']:,} SV\n"
+            f"• Ca vắng nhất: {min(report['before']):,} → {min(report['after']):,} SV"
+        )
+    
+    def optimize_spread(self):
+        """Sắp xếp lại thứ tự các ca để SV ít phải thi nhiều môn trong 1 ngày"""
+        success, message, report = self.backend.optimize_student_spread()
+        if not success:
+            messagebox.showwarning("Cảnh báo", message)
+            return
+        
+        self.display_results()
+        self.check_conflicts()
+        self.graph_dirty = True
+        self.refresh_graph_tab()
+        self.update_stats()
+        messagebox.showinfo("HOÀN THÀNH", message)
+    
     def display_results(self):
-        """Hiển thị kết quả lên UI"""
+        """Hiển thị kết quả lên UI (các tab đọc cùng 1 ảnh chụp lịch)"""
+        with self.backend.read_view():
+            self._display_results()
+    
+    def _display_results(self):
         # Xóa dữ liệu cũ
-        for tree in [self.tree_day, self.tree_schedule, self.tree_student]:
+        for tree in [self.tree_day, self.tree_schedule]:
             for item in tree.get_children():
                 tree.delete(item)
         
@@ -390,25 +931,30 @@ class ExamSchedulerGUI:
             ))
         
         # Tab 3: Lịch sinh viên
-        for item in self.backend.get_student_schedule():
-            self.tree_student.insert('', 'end', values=(
-                item['mssv'],
-                item['name'],
-                item['date'],
-                f"Ca {item['session']}" if item['session'] > 0 else "",
-                item['subject']
-            ))
+        self.show_student_page(0)
     
-    def filter_students(self, *args):
-        """Lọc sinh viên theo search"""
+    def show_student_page(self, page):
+        """Hiển thị 1 trang lịch sinh viên theo bộ lọc và thứ tự hiện tại"""
+        with self.backend.read_view():
+            self._show_student_page(page)
+    
+    def _show_student_page(self, page):
         search = self.search_var.get()
+        total = self.backend.count_student_schedule(search_term=search)
+        last_page = max(0, (total - 1) // STUDENT_PAGE_SIZE)
+        self.student_page = min(max(page, 0), last_page)
+        offset = self.student_page * STUDENT_PAGE_SIZE
+        sort_by, descending = self.student_sort
         
         # Xóa dữ liệu cũ
         for item in self.tree_student.get_children():
             self.tree_student.delete(item)
         
-        # Hiển thị dữ liệu đã lọc
-        for item in self.backend.get_student_schedule(search_term=search):
+        for item in self.backend.iter_student_schedule(search_term=search,
+                                                       sort_by=sort_by,
+                                                       descending=descending,
+                                                       offset=offset,
+                                                       limit=STUDENT_PAGE_SIZE):
             self.tree_student.insert('', 'end', values=(
                 item['mssv'],
                 item['name'],
@@ -416,6 +962,21 @@ class ExamSchedulerGUI:
                 f"Ca {item['session']}" if item['session'] > 0 else "",
                 item['subject']
             ))
+        
+        shown = min(total, offset + STUDENT_PAGE_SIZE)
+        self.page_label.config(
+            text=f"Dòng {offset + 1 if total else 0:,}–{shown:,} / {total:,}"
+        )
+    
+    def sort_students(self, key):
+        """Sắp xếp lịch sinh viên theo cột (bấm lần nữa để đảo chiều)"""
+        sort_by, descending = self.student_sort
+        self.student_sort = (key, not descending if key == sort_by else False)
+        self.show_student_page(0)
+    
+    def filter_students(self, *args):
+        """Lọc sinh viên theo search"""
+        self.show_student_page(0)
     
     def check_conflicts(self):
         """Kiểm tra vi phạm"""
@@ -447,6 +1008,10 @@ class ExamSchedulerGUI:
         text += f"Sinh viên: {stats['students']:,}\n"
         text += f"Môn học: {stats['subjects']:,}\n"
         text += f"Xung đột cạnh: {stats['conflicts']:,}\n"
+        if 'density' in stats:
+            text += f"Mật độ đồ thị: {stats['density']:.1%}\n"
+            text += (f"Bậc: min {stats['degree_min']} • TB {stats['degree_mean']:.1f} • "
+                     f"p90 {stats['degree_p90']:.0f} • max {stats['degree_max']}\n")
         
         if stats['schedule_exists']:
             text += f"\n{'='*40}\n"
@@ -455,15 +1020,49 @@ class ExamSchedulerGUI:
             text += f"Tổng ca thi: {stats['total_slots']}\n"
             text += f"Ca/ngày: {stats['slots_per_day']}\n"
             text += f"Tổng số ngày: {stats['total_days']}\n"
+            
+            text += f"\n{'='*40}\n"
+            text += f"CHẤT LƯỢNG LỊCH\n"
+            text += f"{'='*40}\n"
+            hist = stats['exams_per_day_hist']
+            text += "Số môn/SV/ngày: " + " • ".join(
+                f"{k + 1} môn: {v:,}" for k, v in enumerate(hist) if v) + "\n"
+            text += f"Lượt SV thi ≥2 môn/ngày: {stats['multi_exam_student_days']:,}\n"
+            text += (f"Cặp ca liền nhau: {stats['back_to_back_pairs']:,} "
+                     f"({stats['back_to_back_students']:,} SV)\n")
+            text += (f"Tải ca: max {stats['max_slot_load']:,} • "
+                     f"TB {stats['mean_slot_load']:.0f} • σ {stats['std_slot_load']:.0f}\n")
+            text += f"Tải ngày đông nhất: {stats['max_day_load']:,} lượt SV\n"
+            
+            if 'strategy_timings' in stats:
+                text += f"\n{'='*40}\n"
+                text += f"CHIẾN LƯỢC TÔ MÀU\n"
+                text += f"{'='*40}\n"
+                for name, timing in stats['strategy_timings'].items():
+                    if timing.get('cached'):
+                        text += f"{name}: {timing['slots']} ca • dùng lại kết quả đã lưu\n"
+                    else:
+                        text += f"{name}: {timing['slots']} ca • {timing['seconds'] * 1000:.0f} ms\n"
         
         self.stats_text.delete(1.0, 'end')
         self.stats_text.insert('end', text)
     
+    def refresh_graph_tab(self, *args):
+        """Vẽ lại đồ thị nếu tab đồ thị đang mở và dữ liệu đã thay đổi"""
+        if not self.graph_dirty:
+            return
+        if self.notebook.select() != str(self.tab_graph):
+            return
+        self.graph_dirty = False
+        self.draw_graph()
+    
     def draw_graph(self):
         """Vẽ đồ thị xung đột"""
         self.graph_canvas.delete('all')
-        if not HAS_GRAPH:
+        libs = load_graph_libs()
+        if libs is None:
             return
+        nx, plt, FigureCanvasTkAgg = libs
         
         try:
             graph_data = self.backend.get_graph_data()
@@ -501,7 +1100,8 @@ class ExamSchedulerGUI:
         """Xuất file Excel"""
         filepath = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx *.xls")],
+            filetypes=[("Excel files", "*.xlsx *.xls"),
+                       ("Zip (chia nhiều file Excel)", "*.zip")],
             title="Lưu file lịch thi"
         )
         if not filepath:
@@ -512,8 +1112,99 @@ class ExamSchedulerGUI:
         if success:
             messagebox.showinfo(
                 "Xuất thành công",
-                f"Đã xuất lịch thi ra file:\n{os.path.basename(filepath)}"
+                f"{message}\n\nĐã xuất lịch thi ra file:\n{os.path.basename(filepath)}"
+            )
+        else:
+            messagebox.showerror("Lỗi xuất file", message)
+
+    
+    def export_bundle(self):
+        """Xuất lịch riêng của từng sinh viên / lớp ra file zip"""
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".zip",
+            filetypes=[("Zip files", "*.zip")],
+            title="Lưu gói lịch thi"
+        )
+        if not filepath:
+            return
+        
+        success, message = self.backend.export_student_bundle(
+            filepath,
+            fmt=self.bundle_fmt_var.get(),
+            group_by=self.bundle_group_var.get()
+        )
+        
+        if success:
+            messagebox.showinfo("Xuất thành công", 
+                                f"{message}\n{os.path.basename(filepath)}")
+        else:
+            messagebox.showerror("Lỗi xuất file", message)
+
+    
+    def compare_schedules(self, from_file):
+        """So sánh lịch hiện tại với lịch trước, xuất danh sách SV cần thông báo"""
+        current = self.backend.snapshot_schedule()
+        if current is None or not current.schedule:
+            messagebox.showwarning("Cảnh báo", "Chưa có lịch!")
+            return
+        
+        if from_file:
+            filepath = filedialog.askopenfilename(
+                filetypes=[("Phiên xếp lịch", "*.esnap")]
             )
+            if not filepath:
+                return
+            success, message, old = self.backend.read_schedule_snapshot(filepath)
+            if not success:
+                messagebox.showerror("Lỗi", message)
+                return
+        else:
+            old = self.backend.previous_snapshot
+            if old is None:
+                messagebox.showwarning("Cảnh báo", "Chưa có lần chạy trước để so sánh!")
+                return
+        
+        diff = self.backend.diff_schedules(old, current)
+        summary = (f"• {len(diff['moved'])} môn đổi lịch\n"
+                   f"• {len(diff['added'])} môn mới, {len(diff['removed'])} môn bị hủy\n"
+                   f"• {diff['unchanged']} môn giữ nguyên\n"
+                   f"• {diff['affected_students']:,} sinh viên bị ảnh hưởng")
+        if not (diff['moved'] or diff['added'] or diff['removed']):
+            messagebox.showinfo("So sánh lịch", "Lịch không thay đổi!\n\n" + summary)
+            return
+        if not messagebox.askyesno("So sánh lịch", 
+                                   summary + "\n\nXuất danh sách thông báo cho SV?"):
+            return
+        
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv")],
+            initialfile=f"ThongBao_DoiLich_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+        )
+        if not filepath:
+            return
+        success, message = self.backend.export_schedule_diff(filepath, old, current)
+        if success:
+            messagebox.showinfo("Thành công", message)
+        else:
+            messagebox.showerror("Lỗi", message)
+    
+    def export_graph(self):
+        """Xuất đồ thị xung đột ra DIMACS / edge list / GraphML"""
+        fmt = self.graph_fmt_var.get()
+        ext = {'dimacs': '.col', 'edgelist': '.tsv', 'graphml': '.graphml'}[fmt]
+        filepath = filedialog.asksaveasfilename(
+            defaultextension=ext,
+            filetypes=[(fmt, f"*{ext}")],
+            title="Lưu đồ thị xung đột"
+        )
+        if not filepath:
+            return
+        
+        success, message = self.backend.export_graph(filepath, fmt=fmt)
+        
+        if success:
+            messagebox.showinfo("Xuất thành công", message)
         else:
             messagebox.showerror("Lỗi xuất file", message)
 